@@ -1,92 +1,70 @@
+import time
 import streamlit as st
 import pandas as pd
-from sqlalchemy import create_engine, text
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-engine = create_engine('sqlite:///nkp_ems_db.db')
-
-# Function to read data from the database for each table
-def read_admin_data():
-    return pd.read_sql_query("SELECT * FROM admins", engine)
-
-def read_attendance_data():
-    return pd.read_sql_query("SELECT * FROM attendances", engine)
-
+from sqlalchemy import text
+from datetime import datetime
+from payroll import read_monthly_salary
+from payroll_rules import OPENING_RATE_DATE, mark_months_dirty, record_rate
+from schema import ensure_schema
+from storage import get_engine, run_write
+from punch_ingest import get_ingestor
+from pagination import paginated_table
+from attendance_rollups import render_attendance_summary
+from exports import render_export
+from data_access import invalidate
+from instrumentation import page_timer
+from jobs import POLL_INTERVAL, POLL_SECONDS, get_job, submit_job
+import queries
+from auth import LoginThrottled, authenticate, client_key, hash_password
+from leave_approvals import decide_leaves, format_leave_dates
+from reminders import DOCUMENT_TYPES, REMINDER_WINDOW_DAYS, expiring_within, index_employee_documents, start_reminder_scheduler
+
+engine = get_engine()
+ensure_schema(engine)
+start_reminder_scheduler(engine)
+
+# Function to read the employees for the edit form (served from the process-wide query cache,
+# which the write paths below invalidate; kept as stored text because the inputs are prefilled from it)
 def read_employee_data():
-    return pd.read_sql_query("SELECT * FROM employees", engine)
-
-def read_leave_data():
-    return pd.read_sql_query("SELECT * FROM leaves", engine)
-
-def read_salary_data():
-    return pd.read_sql_query("SELECT * FROM salaries", engine)
+    return queries.employees(engine)
 
 # Function to check expiration dates and send reminders
 def send_reminders():
-    today = datetime.now().date()
-
-    employee_data = read_employee_data()
-
-    # Filter employees with passports, visas, and permits expiring soon
-    expiring_passports = employee_data[employee_data['passport_expiry_date'].apply(pd.to_datetime).dt.date < today + timedelta(days=30)]
-    expiring_visas = employee_data[employee_data['visa_expiry_date'].apply(pd.to_datetime).dt.date < today + timedelta(days=30)]
-    expiring_permits = employee_data[employee_data['permit_expiry_date'].apply(pd.to_datetime).dt.date < today + timedelta(days=30)]
-
-    # Display reminders if there are expiring documents
-    if not expiring_passports.empty:
-        st.warning("Passports Expiring Soon:")
-        st.table(expiring_passports[['full_name', 'passport_expiry_date']])
-
-    if not expiring_visas.empty:
-        st.warning("Visas Expiring Soon:")
-        st.table(expiring_visas[['full_name', 'visa_expiry_date']])
-
-    if not expiring_permits.empty:
-        st.warning("Permits Expiring Soon:")
-        st.table(expiring_permits[['full_name', 'permit_expiry_date']])
+    # Each lookup is a range scan on the precomputed document expiry index
+    for doc_type in DOCUMENT_TYPES:
+        expiring = expiring_within(engine, REMINDER_WINDOW_DAYS, doc_type)
+
+        # Display reminders if there are expiring documents
+        if not expiring.empty:
+            st.warning(f"{doc_type.title()}s Expiring Soon:")
+            st.table(expiring[['full_name', 'expiry_date']])
+
+# Function to follow a background job with a progress bar for up to `wait` seconds and return its
+# last state; while it is still running the button reruns the page to poll again
+def follow_job(job_id, wait=POLL_SECONDS):
+    progress = st.progress(0.0, text="Queued")
+    deadline = time.monotonic() + wait
+    while True:
+        job = get_job(engine, job_id)
+        if job['status'] == 'done':
+            progress.empty()
+            return job
+        if job['status'] == 'failed':
+            progress.empty()
+            st.error(f"Background job failed: {job['error']}")
+            return job
+        progress.progress(job['progress'], text=job['message'] or job['status'].title())
+        if time.monotonic() >= deadline:
+            st.info("Still running in the background. You can leave this page and come back later.")
+            st.button("Check again", key=f"poll_{job_id}")
+            return job
+        time.sleep(POLL_INTERVAL)
 
 def calculate_salary():
-    employee_data = read_employee_data()
-    attendance_data = read_attendance_data()
-
-    attendance_data['attendance_date'] = pd.to_datetime(attendance_data['attendance_date']).dt.date
-
-    attendance_data['action_time'] = pd.to_datetime(attendance_data['action_time']).dt.time
-
-    attendance_data['action_datetime'] = attendance_data.apply(
-        lambda row: datetime.combine(row['attendance_date'], row['action_time']),
-        axis=1
-    )
-    
-    merged_data = pd.merge(attendance_data, employee_data, on='emp_code')
-
-    merged_data['time_difference'] = merged_data.groupby(['emp_code', 'attendance_date'])['action_datetime'].diff()
-
-    merged_data['hours_worked'] = merged_data['time_difference'].dt.total_seconds() / 3600
-    
-    merged_data['salary'] = merged_data['hours_worked'] * merged_data['hourly_rate']
-
-    merged_data['attendance_date'] = pd.to_datetime(merged_data['attendance_date'])
-
-    merged_data['attendance_month'] = merged_data['attendance_date'].dt.strftime('%Y-%m')
-
-    monthly_salary = merged_data.groupby(['emp_code', 'attendance_month'])['salary'].sum().reset_index()
-    
-    for index, row in monthly_salary.iterrows():
-        emp_code = row['emp_code']
-        net_salary = row['salary']
-        salary_month = row['attendance_month']
-        generate_date = datetime.now()
-
-        insert_query = f"""
-        INSERT INTO salaries (emp_code, net_salary, salary_month, generate_date)
-        VALUES ('{emp_code}', {net_salary}, '{salary_month}', '{generate_date}')
-        """
-
-        with engine.connect() as connection:
-            connection.execute(text(insert_query))
+    # New punches are priced by a background job, shared with any other admin asking meanwhile;
+    # until it finishes the salaries stored so far are shown
+    follow_job(submit_job(engine, 'refresh_salaries'))
+    monthly_salary = read_monthly_salary(engine)
 
     st.table(monthly_salary)
     
@@ -97,14 +75,11 @@ def generate_salary_summary_report():
     st.subheader("Salary Summary Report")
 
     # Calculate salary using the existing function
-    salary_data = calculate_salary()
+    calculate_salary()
 
-    plt.figure(figsize=(10, 6))
-    sns.barplot(x='emp_code', y='salary', data=salary_data)
-    plt.title('Total Salary Summary')
-    plt.xlabel('Employee')
-    plt.ylabel('Total Salary')
-    st.pyplot(plt)
+    # Charting is only loaded by the sessions that open this report
+    from report_charts import render_salary_summary
+    render_salary_summary(engine)
 
 # Function to generate reports
 def generate_reports():
@@ -112,15 +87,9 @@ def generate_reports():
 
     report_type = st.selectbox("Select Report Type", ["Attendance Summary", "Salary Summary"])
 
-    employee_data = read_employee_data()
-    attendance_data = read_attendance_data()
-    
-    attendance = pd.merge(employee_data, attendance_data, on='emp_code')
-    
     if report_type == "Attendance Summary":
         st.subheader("Attendance Summary")
-        attendance_summary = attendance.groupby('full_name')['attendance_date'].count().reset_index(name='Total Days Present')
-        st.table(attendance_summary)
+        render_attendance_summary(engine)
 
     elif report_type == "Salary Summary":
         generate_salary_summary_report()
@@ -133,21 +102,19 @@ def display_login_form():
     password = st.text_input("Password", type="password")
     
     if st.button("Login"):
-        # Validate admin login credentials
-        admin_query = f"SELECT * FROM admins WHERE admin_code = :username AND admin_password = :password"
-        admin_result = pd.read_sql_query(admin_query, engine, params={"username": username, "password": password})
+        try:
+            role = authenticate(engine, username, password, client_address())
+        except LoginThrottled as throttled:
+            st.error(str(throttled))
+            return
 
-        if not admin_result.empty:
+        if role == 'admin':
             st.success("Logged in as Admin")
             st.session_state.is_admin = True
             st.session_state.current_user = username
             return
 
-        # Validate employee login credentials
-        employee_query = "SELECT * FROM employees WHERE emp_code = :username AND emp_password = :password"
-        employee_result = pd.read_sql_query(employee_query, engine, params={"username": username, "password": password})
-
-        if not employee_result.empty:
+        if role == 'employee':
             st.success("Logged in as Employee")
             st.session_state.is_admin = False
             st.session_state.current_user = username
@@ -155,6 +122,17 @@ def display_login_form():
 
         st.error("Invalid username or password")
 
+# Function to get the remote address of the current session (None outside a browser session)
+def client_address():
+    try:
+        from streamlit.runtime import get_instance
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        client = get_instance().get_client(get_script_run_ctx().session_id)
+        return client_key(client.request.remote_ip, client.request.headers.get('X-Forwarded-For'))
+    except Exception:
+        return None
+
 # Staff Leave Application
 def staff_leave_application():
     st.subheader("Leave Application")
@@ -166,10 +144,14 @@ def staff_leave_application():
     leave_type = st.selectbox("Leave Type", ["Paid", "Unpaid"])
 
     if st.button("Submit Leave Request"):
+        if not leave_date:
+            st.error("Select a leave date.")
+            return
+
         leave_request = pd.DataFrame({
             'emp_code': [emp_code],
             'leave_subject': [leave_subject],
-            'leave_date': [leave_date],
+            'leave_dates': [format_leave_dates(leave_date)],
             'leave_message': [leave_message],
             'leave_type': [leave_type],
             'leave_status': ['pending'],
@@ -177,31 +159,33 @@ def staff_leave_application():
             'admin_approval_date': [None]
         })
 
-        leave_request.to_sql('leaves', con=engine, index=False, if_exists='append')
+        run_write(engine, lambda connection: leave_request.to_sql('leaves', con=connection, index=False, if_exists='append'))
+        invalidate(engine, 'leaves')
         st.success("Leave request submitted successfully!")
 
 def admin_leave_approval():
     st.subheader("Leave Approval (Admin View)")
     
-    leave_data = read_leave_data()
-
-    pending_leave_requests = pd.read_sql_query("SELECT * FROM leaves WHERE leave_status = 'pending'", engine)
+    pending_leave_requests = queries.leaves(engine, status='pending')
 
     if not pending_leave_requests.empty:
         st.table(pending_leave_requests[['leave_id','emp_code', 'leave_subject', 'leave_dates', 'leave_message', 'leave_type', 'apply_date']])
 
-        leave_to_approve = st.selectbox("Select Leave Request to Approve/Deny", pending_leave_requests['leave_id'].tolist())
+        leaves_to_decide = st.multiselect("Select Leave Requests to Approve/Deny", pending_leave_requests['leave_id'].tolist())
 
         approval_status = st.radio("Choose Approval Status", ['Approve', 'Deny'])
 
         if st.button("Submit Approval"):
-            approval_date = datetime.now()
-            leave_data.loc[leave_data['leave_id'] == leave_to_approve, 'leave_status'] = 'approve' if approval_status == 'Approve' else 'reject'
-            leave_data.loc[leave_data['leave_id'] == leave_to_approve, 'admin_approval_date'] = approval_date
-
-            leave_data.to_sql('leaves', con=engine, index=False, if_exists='replace')
-
-            st.success(f"Leave request {approval_status}d successfully on {approval_date}")
+            if not leaves_to_decide:
+                st.warning("Select at least one leave request.")
+            else:
+                decided = decide_leaves(engine, leaves_to_decide, approval_status)
+                invalidate(engine, 'leaves')
+
+                decided_as = 'approved' if approval_status == 'Approve' else 'denied'
+                st.success(f"{decided} leave request(s) {decided_as} successfully on {datetime.now()}")
+                if decided < len(leaves_to_decide):
+                    st.warning(f"{len(leaves_to_decide) - decided} request(s) had already been decided and were left unchanged.")
     else:
         st.info("No pending leave requests.")
 
@@ -214,15 +198,8 @@ def staff_attendance():
     emp_desc = st.text_input("Description")
 
     if st.button("Submit Attendance"):
-        attendance_entry = pd.DataFrame({
-            'emp_code': [emp_code],
-            'attendance_date': [datetime.now().date()],
-            'action_name': [action_name],
-            'action_time': [datetime.now().strftime("%H:%M:%S")],
-            'emp_desc': [emp_desc]
-        })
-
-        attendance_entry.to_sql('attendances', con=engine, index=False, if_exists='append')
+        # Queued for the next group commit; returns once the punch is stored
+        get_ingestor(engine).record(emp_code, action_name, emp_desc)
         st.success(f"Attendance {action_name} successfully!")
 
 # Function to update or add employee information
@@ -264,7 +241,7 @@ def add_employee_info():
     if st.button("Add Employee"):
         add_request = pd.DataFrame({
             'emp_code': [new_emp_code],
-            'emp_password': [new_emp_password],
+            'emp_password': [hash_password(new_emp_password)],
             'full_name': [new_full_name],
             'dob': [new_dob],
             'gender': [new_gender],
@@ -288,7 +265,13 @@ def add_employee_info():
             'hourly_rate': [new_hourly_rate]
         })
         
-        add_request.to_sql('employees', con=engine, index=False, if_exists='append')
+        def add_employee(connection):
+            add_request.to_sql('employees', con=connection, index=False, if_exists='append')
+            index_employee_documents(connection, [new_emp_code])
+            record_rate(connection, new_emp_code, new_hourly_rate, OPENING_RATE_DATE)
+
+        run_write(engine, add_employee)
+        invalidate(engine, 'employees', 'document_expiry')
         st.success("Employee added successfully!")
 
 def update_employee_info(employees):
@@ -309,7 +292,8 @@ def update_employee_info(employees):
 
     # Input fields for updating employee details
     updated_emp_code = st.text_input("Employee Code", value=selected_employee_details['emp_code'])
-    updated_emp_password = st.text_input("Password", type="password", value=selected_employee_details['emp_password'])
+    # Left empty: the stored hash is never sent to the browser, and a blank field keeps the password
+    updated_emp_password = st.text_input("New Password (leave blank to keep the current one)", type="password")
     updated_full_name = st.text_input("Full Name", value=selected_employee_details['full_name'])
     updated_dob = st.text_input("Date of Birth", value=selected_employee_details['dob'])
     updated_gender = st.selectbox("Gender", ['male', 'female'], index=0 if selected_employee_details['gender'] == 'male' else 1)
@@ -344,7 +328,7 @@ def update_employee_info(employees):
             UPDATE employees
             SET
             emp_code = :emp_code,
-            emp_password = :emp_password,
+            emp_password = COALESCE(:emp_password, emp_password),
             full_name = :full_name,
             dob = :dob,
             gender = :gender,
@@ -369,59 +353,67 @@ def update_employee_info(employees):
             WHERE emp_code = :emp_code
         """)
 
-        # Execute the update query        
-        with engine.connect() as connection:
-            trans = connection.begin()
-            try:
-                connection.execute(update_query, {
-                    "emp_code": updated_emp_code,
-                    "emp_password": updated_emp_password,
-                    "full_name": updated_full_name,
-                    "dob": updated_dob,
-                    "gender": updated_gender,
-                    "nationality": updated_nationality,
-                    "address": updated_address,
-                    "phone_number": updated_phone_number,
-                    "email": updated_email,
-                    "passport_number": updated_passport_number,
-                    "passport_country": updated_passport_country,
-                    "passport_issue_date": updated_passport_issue_date,
-                    "passport_expiry_date": updated_passport_expiry_date,
-                    "visa_type": updated_visa_type,
-                    "visa_number": updated_visa_number,
-                    "visa_issue_date": updated_visa_issue_date,
-                    "visa_expiry_date": updated_visa_expiry_date,
-                    "visa_status": updated_visa_status,
-                    "permit_type": updated_permit_type,
-                    "permit_number": updated_permit_number,
-                    "permit_issue_date": updated_permit_issue_date,
-                    "permit_expiry_date": updated_permit_expiry_date,
-                    "hourly_rate": updated_hourly_rate
-                })
-                trans.commit()
-                st.success("Employee information updated successfully!")
-            except Exception as e:
-                trans.rollback()
-                st.error(f"Error updating employee information: {str(e)}")
-
-def delete_employee_info(employees):
+        update_params = {
+            "emp_code": updated_emp_code,
+            "emp_password": hash_password(updated_emp_password) if updated_emp_password else None,
+            "full_name": updated_full_name,
+            "dob": updated_dob,
+            "gender": updated_gender,
+            "nationality": updated_nationality,
+            "address": updated_address,
+            "phone_number": updated_phone_number,
+            "email": updated_email,
+            "passport_number": updated_passport_number,
+            "passport_country": updated_passport_country,
+            "passport_issue_date": updated_passport_issue_date,
+            "passport_expiry_date": updated_passport_expiry_date,
+            "visa_type": updated_visa_type,
+            "visa_number": updated_visa_number,
+            "visa_issue_date": updated_visa_issue_date,
+            "visa_expiry_date": updated_visa_expiry_date,
+            "visa_status": updated_visa_status,
+            "permit_type": updated_permit_type,
+            "permit_number": updated_permit_number,
+            "permit_issue_date": updated_permit_issue_date,
+            "permit_expiry_date": updated_permit_expiry_date,
+            "hourly_rate": updated_hourly_rate
+        }
+
+        # Execute the update query (retried if another session holds the write lock)
+        try:
+            def update_employee(connection):
+                connection.execute(update_query, update_params)
+                index_employee_documents(connection, [updated_emp_code])
+                # A new rate applies from today; earlier days keep the rate they were worked at
+                if updated_hourly_rate != selected_employee_details['hourly_rate']:
+                    record_rate(connection, updated_emp_code, updated_hourly_rate)
+                    mark_months_dirty(connection, [(updated_emp_code, datetime.now().strftime('%Y-%m'))])
+
+            run_write(engine, update_employee)
+            invalidate(engine, 'employees', 'document_expiry')
+            st.success("Employee information updated successfully!")
+        except Exception as e:
+            st.error(f"Error updating employee information: {str(e)}")
+
+def delete_employee_info(emp_codes):
     # Delete Employee Section
     st.subheader("Delete Employee")
-    selected_employee_to_delete = st.selectbox("Select Employee to Delete", employees['emp_code'].unique())
+    selected_employee_to_delete = st.selectbox("Select Employee to Delete", emp_codes)
 
     if st.button("Delete Employee"):
         # Perform SQL delete operation to remove the selected employee
-        delete_query = f"""
-            DELETE FROM employees WHERE emp_code = '{selected_employee_to_delete}';
-        """
-        with engine.connect() as connection:
-            connection.execute(delete_query)
+        delete_query = text("DELETE FROM employees WHERE emp_code = :emp_code")
+        def delete_employee(connection):
+            connection.execute(delete_query, {"emp_code": selected_employee_to_delete})
+            index_employee_documents(connection, [selected_employee_to_delete])
+
+        run_write(engine, delete_employee)
+        invalidate(engine, 'employees', 'document_expiry')
         st.success("Employee deleted successfully!")
 
 # Function to read leave data for a specific staff member
 def read_staff_leave_data(emp_code):
-    query = f"SELECT * FROM leaves WHERE emp_code = '{emp_code}'"
-    return pd.read_sql_query(query, engine)
+    return queries.leaves(engine, emp_code=emp_code)
 
 # Function to display staff leave table
 def display_staff_leave_table(emp_code):
@@ -445,7 +437,7 @@ def display_logout_button():
         st.success("Logged out successfully!")
 
 # Main function for the Streamlit app
-def main():
+def main(timing):
     # Display the logo
     logo_path = "full.png"
     st.image(logo_path, use_column_width=True)
@@ -460,9 +452,6 @@ def main():
         unsafe_allow_html=True
     )
     
-    attendance_data = read_attendance_data()
-    salary_data = read_salary_data()
-
     # Initialize session state
     if 'is_admin' not in st.session_state:
         st.session_state.is_admin = False
@@ -471,15 +460,17 @@ def main():
 
     # Check if the user is logged in
     if not st.session_state.is_admin and st.session_state.current_user is None:
+        timing['page'] = "Login"
         display_login_form()
         return
     
     st.subheader(f"Welcome, {st.session_state.current_user}!")
     # Sidebar for navigation
     if st.session_state.is_admin:
-        page = st.sidebar.selectbox("Select a Page", ["Employee Records", "Add Employee", "Update Employee", "Attendance", "Leave Requests", "Payroll", "Reports"])
+        page = st.sidebar.selectbox("Select a Page", ["Employee Records", "Add Employee", "Update Employee", "Attendance", "Leave Requests", "Payroll", "Reports", "Diagnostics"])
     else:
         page = st.sidebar.selectbox("Select a Page", ["Employee Details", "Salary", "Punch In/Out", "Leave Requests"])
+    timing['page'] = f"{'admin' if st.session_state.is_admin else 'staff'}: {page}"
         
     # Logout button
     if st.session_state.current_user is not None:
@@ -492,35 +483,48 @@ def main():
         # Admin has access to all pages
         if page == "Employee Records":
             st.subheader("Employee Records (Admin View)")
-            employees = pd.read_sql_query("SELECT * FROM employees", engine)
-            st.table(employees)
-            delete_employee_info(employees)
+            paginated_table(engine, 'employees')
+            delete_employee_info(queries.employee_codes(engine))
         elif page == "Add Employee":
             add_employee_info()
         elif page == "Update Employee":
-            employees = pd.read_sql_query("SELECT * FROM employees", engine)
+            employees = read_employee_data()
             update_employee_info(employees)
         elif page == "Attendance":
             st.subheader("Attendance Tracking (Admin View)")
-            st.table(attendance_data)
+            paginated_table(engine, 'attendances')
+            render_export(engine, 'attendances')
         elif page == "Leave Requests":
             admin_leave_approval()
         elif page == "Payroll":
             st.subheader("Payroll (Admin View)")
-            payroll_result = salary_data
-            st.table(payroll_result)
+            # After changing the payroll rules: reprice every month in the background
+            if st.button("Recompute all salaries"):
+                st.session_state.rebuild_job = submit_job(engine, 'rebuild_salaries')
+            if st.session_state.get('rebuild_job'):
+                job = follow_job(st.session_state.rebuild_job)
+                if job['status'] in ('done', 'failed'):
+                    st.session_state.rebuild_job = None
+                if job['status'] == 'done':
+                    st.success(f"Recomputed {job['result']['updated']} monthly salaries")
+            paginated_table(engine, 'salaries')
+            render_export(engine, 'salaries')
         elif page == "Reports":
             send_reminders()
             generate_reports()
+        elif page == "Diagnostics":
+            # Loaded only by the admins who open it
+            from diagnostics import render_diagnostics
+            render_diagnostics()
     else:
         # Staff has limited access
         if page == "Employee Details":
             st.subheader(f"Employee Details ({st.session_state.current_user} View)")
-            staff_data = pd.read_sql_query(f"SELECT * FROM employees WHERE emp_code = '{st.session_state.current_user}'", engine)
+            staff_data = queries.employees(engine, emp_code=st.session_state.current_user)
             st.table(staff_data)
         elif page == "Salary":
             st.subheader(f"Salary ({st.session_state.current_user} View)")
-            staff_payroll = salary_data[salary_data['emp_code'] == st.session_state.current_user]
+            staff_payroll = queries.salaries(engine, emp_code=st.session_state.current_user)
             st.table(staff_payroll)
         elif page == "Punch In/Out":
             staff_attendance()
@@ -534,4 +538,6 @@ def main():
 
 # Run the app
 if __name__ == "__main__":
-    main()
+    # Every script run is timed per page for the Diagnostics page
+    with page_timer() as timing:
+        main(timing)
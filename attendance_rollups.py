@@ -0,0 +1,232 @@
+import argparse
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+
+import queries
+from data_access import cached_query, invalidate
+from frame_types import apply_dtypes
+from payroll import pair_punches, prepare_punches, read_watermark, rescan_floor, set_watermark
+from storage import get_engine, run_write
+
+# A first punchin after this time of day counts as a late arrival
+LATE_AFTER = os.environ.get('NKP_EMS_LATE_AFTER', '09:00:00')
+
+# Watermark row tracking how far into attendances the rollups have been maintained
+WATERMARK_NAME = 'attendance_rollups'
+
+DAILY_COLUMNS = [
+    'emp_code', 'work_date', 'week_start', 'month_start', 'punches',
+    'first_punchin', 'hours_worked', 'late_arrival', 'missing_punchouts'
+]
+
+# Rollups kept on top of attendance_daily: grain -> column of attendance_daily holding the period start
+ROLLUP_GRAINS = {'week': 'week_start', 'month': 'month_start'}
+
+# Function to summarise raw attendance rows into one row per employee and day
+def daily_rollup(attendance_data):
+    punches = prepare_punches(attendance_data)
+    shifts = pair_punches(punches)
+    keys = ['emp_code', 'work_date']
+    punchins = punches[punches['action_name'] == 'punchin']
+
+    days = punches.groupby(keys, observed=True).size().rename('punches').to_frame()
+    days = days.join(punchins.groupby(keys, observed=True).agg(
+        punchins=('punch_time', 'size'), first_punchin=('punch_time', 'min')
+    ))
+    days = days.join(shifts.groupby(keys, observed=True).agg(
+        shifts=('hours_worked', 'size'), hours_worked=('hours_worked', 'sum')
+    ))
+    days = days.reset_index()
+    days[['punchins', 'shifts', 'hours_worked']] = days[['punchins', 'shifts', 'hours_worked']].fillna(0)
+
+    # Every punchin not closed by a punchout the same day is a missing punchout
+    days['missing_punchouts'] = (days['punchins'] - days['shifts']).astype(int)
+    days['late_arrival'] = ((days['first_punchin'] - days['work_date']) > pd.Timedelta(LATE_AFTER)).astype(int)
+    first_punchin = np.datetime_as_string(days['first_punchin'].to_numpy().astype('datetime64[s]'))
+    days['first_punchin'] = np.where(days['first_punchin'].notna(), np.char.partition(first_punchin, 'T')[:, 2], None)
+    days['week_start'] = iso_dates(days['work_date'] - pd.to_timedelta(days['work_date'].dt.dayofweek, unit='D'))
+    days['month_start'] = iso_dates(days['work_date'], 'M')
+    days['work_date'] = iso_dates(days['work_date'])
+    days['emp_code'] = days['emp_code'].astype(str)
+    return days[DAILY_COLUMNS]
+
+# Function to format datetimes as 'YYYY-MM-DD', truncated to the start of their day or month
+# (numpy's formatter is much faster than .dt.strftime)
+def iso_dates(timestamps, unit='D'):
+    return np.datetime_as_string(timestamps.to_numpy().astype(f'datetime64[{unit}]').astype('datetime64[D]'))
+
+# Days that received punches since the watermark, nothing newer than max_id
+TOUCHED_DAYS = """
+    SELECT DISTINCT emp_code, attendance_date FROM attendances
+    WHERE attendance_id > :last_id AND attendance_id <= :max_id
+"""
+
+# Function to bring the daily, weekly and monthly rollups up to date with new punches
+def refresh_rollups(engine):
+    return run_write(engine, refresh_touched_days)
+
+def refresh_touched_days(connection):
+    last_id = read_watermark(connection, WATERMARK_NAME)
+    max_id = connection.execute(text("SELECT MAX(attendance_id) FROM attendances")).scalar() or 0
+    # Days of late-committing rows below the watermark are folded again (see payroll.rescan_floor)
+    floor = rescan_floor(connection, last_id)
+    if max_id <= floor:
+        return 0
+
+    params = {"last_id": floor, "max_id": max_id}
+    attendance_data = apply_dtypes(pd.read_sql_query(text(f"""
+        SELECT emp_code, attendance_date, action_name, action_time FROM attendances
+        WHERE attendance_id <= :max_id AND (emp_code, attendance_date) IN ({TOUCHED_DAYS})
+    """), connection, params=params), 'attendances')
+    connection.execute(text(
+        f"DELETE FROM attendance_daily WHERE (emp_code, work_date) IN ({TOUCHED_DAYS})"
+    ), params)
+    days = save_daily(connection, daily_rollup(attendance_data))
+
+    # Re-aggregate every week and month that contains a touched day
+    for grain, period_column in ROLLUP_GRAINS.items():
+        touched_periods = f"""
+            SELECT emp_code, {period_column} FROM attendance_daily
+            WHERE (emp_code, work_date) IN ({TOUCHED_DAYS})
+        """
+        connection.execute(text(f"""
+            DELETE FROM attendance_rollups
+            WHERE grain = :grain AND (emp_code, period_start) IN ({touched_periods})
+        """), {**params, "grain": grain})
+        connection.execute(text(f"""
+            INSERT INTO attendance_rollups
+                (grain, emp_code, period_start, days_present, hours_worked, late_arrivals, missing_punchouts)
+            SELECT :grain, emp_code, {period_column}, COUNT(*), SUM(hours_worked), SUM(late_arrival), SUM(missing_punchouts)
+            FROM attendance_daily
+            WHERE (emp_code, {period_column}) IN ({touched_periods})
+            GROUP BY emp_code, {period_column}
+        """), {**params, "grain": grain})
+
+    set_watermark(connection, max_id, WATERMARK_NAME)
+    return days
+
+# Function to recompute every rollup from scratch (after changing LATE_AFTER or deleting punches)
+def rebuild_rollups(engine):
+    def rebuild(connection):
+        connection.execute(text("DELETE FROM attendance_daily"))
+        connection.execute(text("DELETE FROM attendance_rollups"))
+        set_watermark(connection, 0, WATERMARK_NAME)
+        return refresh_touched_days(connection)
+
+    return run_write(engine, rebuild)
+
+# Function to insert computed daily rows
+def save_daily(connection, days):
+    if days.empty:
+        return 0
+    # Plain tuples through the driver's executemany skip SQLAlchemy's per-row parameter processing
+    placeholder = '?' if connection.dialect.paramstyle == 'qmark' else '%s'
+    connection.exec_driver_sql(
+        f"INSERT INTO attendance_daily ({', '.join(DAILY_COLUMNS)}) "
+        f"VALUES ({', '.join([placeholder] * len(DAILY_COLUMNS))})",
+        list(days.itertuples(index=False, name=None))
+    )
+    return len(days)
+
+# Function to total each employee's attendance between two dates (inclusive). Whole months come
+# from the monthly rollup and only the partial months at either end are summed from daily rows.
+def attendance_totals(engine, start_date, end_date):
+    first_full_month = start_date if start_date.day == 1 else (start_date.replace(day=1) + timedelta(days=32)).replace(day=1)
+    after_full_months = (end_date + timedelta(days=1)).replace(day=1)
+    return cached_query(engine, ['attendance_rollups', 'attendance_daily', 'employees'], """
+        SELECT employees.full_name AS "Employee", parts.emp_code AS "Employee Code",
+               SUM(parts.days_present) AS "Total Days Present", ROUND(SUM(parts.hours_worked), 2) AS "Hours Worked",
+               SUM(parts.late_arrivals) AS "Late Arrivals", SUM(parts.missing_punchouts) AS "Missing Punchouts"
+        FROM (
+            SELECT emp_code, days_present, hours_worked, late_arrivals, missing_punchouts
+            FROM attendance_rollups
+            WHERE grain = 'month' AND period_start >= :first_full_month AND period_start < :after_full_months
+            UNION ALL
+            SELECT emp_code, 1, hours_worked, late_arrival, missing_punchouts
+            FROM attendance_daily
+            WHERE work_date >= :start_date AND work_date <= :end_date
+            AND (work_date < :first_full_month OR work_date >= :after_full_months)
+        ) AS parts
+        LEFT JOIN employees ON employees.emp_code = parts.emp_code
+        GROUP BY parts.emp_code, employees.full_name
+        ORDER BY parts.emp_code
+    """, {
+        "start_date": start_date.isoformat(), "end_date": end_date.isoformat(),
+        "first_full_month": first_full_month.isoformat(), "after_full_months": after_full_months.isoformat()
+    })
+
+# Function to read one row per employee and day, week or month overlapping two dates
+def attendance_periods(engine, grain, start_date, end_date, emp_code=None):
+    # Weeks and months that started before start_date but overlap it are included
+    first_period = {'day': start_date, 'week': start_date - timedelta(days=start_date.weekday()),
+                    'month': start_date.replace(day=1)}[grain]
+    params = {"start_date": first_period.isoformat(), "end_date": end_date.isoformat()}
+    if grain == 'day':
+        query = """
+            SELECT emp_code, work_date AS period_start, 1 AS days_present, hours_worked,
+                   late_arrival AS late_arrivals, missing_punchouts, first_punchin
+            FROM attendance_daily WHERE work_date >= :start_date AND work_date <= :end_date
+        """
+    else:
+        query = """
+            SELECT emp_code, period_start, days_present, hours_worked, late_arrivals, missing_punchouts
+            FROM attendance_rollups
+            WHERE grain = :grain AND period_start >= :start_date AND period_start <= :end_date
+        """
+        params["grain"] = grain
+    if emp_code is not None:
+        query += " AND emp_code = :emp_code"
+        params["emp_code"] = emp_code
+    return cached_query(engine, ['attendance_rollups', 'attendance_daily'], query + " ORDER BY emp_code, period_start", params)
+
+# Function to return the first and last day with attendance, or None when there is none
+def attendance_bounds(engine):
+    bounds = cached_query(engine, ['attendance_daily'], "SELECT MIN(work_date) AS first, MAX(work_date) AS last FROM attendance_daily")
+    if bounds['first'].isna().all():
+        return None
+    return date.fromisoformat(bounds['first'][0]), date.fromisoformat(bounds['last'][0])
+
+# Function to show the attendance summary from the rollups, with drill-down to the raw punches
+def render_attendance_summary(engine):
+    if refresh_rollups(engine):
+        invalidate(engine, 'attendance_daily', 'attendance_rollups')
+
+    bounds = attendance_bounds(engine)
+    if bounds is None:
+        st.info("No attendance recorded yet.")
+        return
+
+    period = st.date_input("Period", bounds, key="attendance_summary_period")
+    if not isinstance(period, (list, tuple)) or len(period) != 2:
+        return
+    start_date, end_date = period
+
+    totals = attendance_totals(engine, start_date, end_date)
+    st.table(totals)
+
+    grain = st.selectbox("Breakdown", ['Daily', 'Weekly', 'Monthly'], index=2, key="attendance_summary_grain")
+    grain = {'Daily': 'day', 'Weekly': 'week', 'Monthly': 'month'}[grain]
+    st.dataframe(attendance_periods(engine, grain, start_date, end_date), hide_index=True)
+
+    emp_code = st.selectbox("Show punches of", [None] + totals['Employee Code'].tolist(), key="attendance_summary_drill")
+    if emp_code is not None:
+        st.dataframe(queries.attendances(engine, emp_code, start_date, end_date), hide_index=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Attendance rollup maintenance")
+    parser.add_argument('command', choices=['refresh', 'rebuild'],
+                        help="refresh: fold in new punches; rebuild: recompute every rollup")
+    parser.add_argument('--database-url', help="Overrides NKP_EMS_DB_URL")
+    args = parser.parse_args()
+
+    engine = get_engine(args.database_url)
+    days = refresh_rollups(engine) if args.command == 'refresh' else rebuild_rollups(engine)
+    print(f"Updated {days} employee-day row(s)")
+
+if __name__ == "__main__":
+    main()
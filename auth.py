@@ -0,0 +1,202 @@
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+from data_access import invalidate
+from storage import get_engine, run_write
+
+# PBKDF2-SHA256 work factor for new hashes; raise it as hardware gets faster. Stored hashes
+# with a different cost are re-hashed on the next successful login.
+PASSWORD_ITERATIONS = int(os.environ.get('NKP_EMS_PASSWORD_ITERATIONS', 600_000))
+HASH_SCHEME = 'pbkdf2_sha256'
+SALT_BYTES = 16
+
+# Successful verifications are remembered this long so repeated logins skip the key derivation
+VERIFIED_TTL = 15 * 60
+MAX_VERIFIED = 4096
+
+# Token buckets: a burst of `capacity` attempts, then one more every `refill_seconds`
+USERNAME_BUCKET = {'capacity': 5, 'refill_seconds': 30}
+ADDRESS_BUCKET = {'capacity': 20, 'refill_seconds': 3}
+MAX_BUCKETS = 10_000
+
+# Reverse proxies (comma-separated addresses) whose X-Forwarded-For header is believed; with none
+# configured the header is ignored, as any client can set it to dodge the per-address limit
+TRUSTED_PROXIES = {address.strip() for address in os.environ.get('NKP_EMS_TRUSTED_PROXIES', '').split(',') if address.strip()}
+
+# Raised when a username or client address has used up its login attempts
+class LoginThrottled(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Too many login attempts, try again in {retry_after:.0f} seconds")
+        self.retry_after = retry_after
+
+# In-memory token-bucket rate limiter keyed by arbitrary strings
+class TokenBucketLimiter:
+    def __init__(self, capacity, refill_seconds, max_buckets=MAX_BUCKETS):
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Function to take one token for key; returns 0 if allowed, else the seconds until a token is free
+    def acquire(self, key):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) / self.refill_seconds)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) * self.refill_seconds
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+            return retry_after
+
+# Function to pick the address to rate-limit: the peer itself, or, when the peer is a trusted proxy,
+# the nearest X-Forwarded-For hop that is not one of our proxies
+def client_key(remote_ip, forwarded_for=None, trusted_proxies=None):
+    trusted_proxies = TRUSTED_PROXIES if trusted_proxies is None else trusted_proxies
+    if remote_ip not in trusted_proxies or not forwarded_for:
+        return remote_ip
+    hops = [hop.strip() for hop in forwarded_for.split(',') if hop.strip()]
+    for hop in reversed(hops):
+        if hop not in trusted_proxies:
+            return hop
+    return remote_ip
+
+username_limiter = TokenBucketLimiter(**USERNAME_BUCKET)
+address_limiter = TokenBucketLimiter(**ADDRESS_BUCKET)
+
+# Function to hash a password as pbkdf2_sha256$iterations$salt$digest
+def hash_password(password, iterations=None):
+    iterations = iterations or PASSWORD_ITERATIONS
+    salt = secrets.token_bytes(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return "$".join([HASH_SCHEME, str(iterations), b64encode(salt), b64encode(digest)])
+
+def is_hashed(stored):
+    return stored.startswith(HASH_SCHEME + "$")
+
+# Function to check a password against a stored value: our hash, a MySQL PASSWORD() hash
+# (as in nkp_ems_db.sql) or a legacy plaintext password
+def check_password(password, stored):
+    if is_hashed(stored):
+        _, iterations, salt, digest = stored.split("$")
+        candidate = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), b64decode(salt), int(iterations))
+        return hmac.compare_digest(candidate, b64decode(digest))
+    if len(stored) == 41 and stored.startswith('*'):
+        candidate = '*' + hashlib.sha1(hashlib.sha1(password.encode('utf-8')).digest()).hexdigest().upper()
+        return hmac.compare_digest(candidate, stored.upper())
+    return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+
+def needs_rehash(stored):
+    return not is_hashed(stored) or int(stored.split("$")[1]) != PASSWORD_ITERATIONS
+
+# Keyed with a per-process secret so the remembered digests are useless outside this process
+_verified_key = secrets.token_bytes(32)
+_verified = OrderedDict()
+_verified_lock = threading.Lock()
+
+# Function to verify a password, skipping the key derivation for recently verified (hash, password) pairs
+def verify_password(password, stored):
+    fingerprint = hmac.new(_verified_key, f"{stored}\0{password}".encode('utf-8'), hashlib.sha256).digest()
+    now = time.monotonic()
+    with _verified_lock:
+        expires = _verified.get(fingerprint)
+        if expires is not None and expires > now:
+            return True
+
+    if not check_password(password, stored):
+        return False
+
+    with _verified_lock:
+        _verified[fingerprint] = now + VERIFIED_TTL
+        while len(_verified) > MAX_VERIFIED:
+            _verified.popitem(last=False)
+    return True
+
+# One lookup by code across both roles, served by the unique indexes on admin_code and emp_code
+CREDENTIALS_QUERY = text("""
+    SELECT 'admin' AS role, admin_code AS code, admin_password AS password_hash FROM admins WHERE admin_code = :code
+    UNION ALL
+    SELECT 'employee' AS role, emp_code AS code, emp_password AS password_hash FROM employees WHERE emp_code = :code
+""")
+
+# Table, key column and password column of each role
+ROLE_TABLES = {
+    'admin': ('admins', 'admin_code', 'admin_password'),
+    'employee': ('employees', 'emp_code', 'emp_password'),
+}
+
+# Function to check a login; returns 'admin', 'employee' or None and raises LoginThrottled when rate limited
+def authenticate(engine, code, password, client_address=None):
+    retry_after = max(username_limiter.acquire(code),
+                      address_limiter.acquire(client_address) if client_address else 0.0)
+    if retry_after:
+        raise LoginThrottled(retry_after)
+
+    with engine.connect() as connection:
+        candidates = connection.execute(CREDENTIALS_QUERY, {"code": code}).fetchall()
+
+    for role, code, stored in candidates:
+        stored = stored.decode('utf-8') if isinstance(stored, bytes) else str(stored)
+        if verify_password(password, stored):
+            if needs_rehash(stored):
+                set_password(engine, role, code, password)
+            return role
+    return None
+
+# Function to store a new hash for a user's password
+def set_password(engine, role, code, password):
+    table, key_column, password_column = ROLE_TABLES[role]
+    password_hash = hash_password(password)
+    run_write(engine, lambda connection: connection.execute(
+        text(f"UPDATE {table} SET {password_column} = :password_hash WHERE {key_column} = :code"),
+        {"password_hash": password_hash, "code": code}
+    ))
+    invalidate(engine, table)
+
+# Function to hash every plaintext password still stored. MySQL PASSWORD() hashes cannot be
+# converted without the password and are upgraded at the user's next login instead.
+def migrate_passwords(engine=None):
+    engine = engine or get_engine()
+    migrated = 0
+    for role, (table, key_column, password_column) in ROLE_TABLES.items():
+        with engine.connect() as connection:
+            rows = connection.execute(text(f"SELECT {key_column}, {password_column} FROM {table}")).fetchall()
+        for code, stored in rows:
+            stored = stored.decode('utf-8') if isinstance(stored, bytes) else str(stored)
+            if is_hashed(stored) or (len(stored) == 41 and stored.startswith('*')):
+                continue
+            set_password(engine, role, code, stored)
+            migrated += 1
+    return migrated
+
+def b64encode(raw):
+    return base64.b64encode(raw).decode('ascii')
+
+def b64decode(encoded):
+    return base64.b64decode(encoded.encode('ascii'))
+
+def main():
+    parser = argparse.ArgumentParser(description="Password maintenance")
+    parser.add_argument('command', choices=['migrate'], help="migrate: hash all plaintext passwords in place")
+    parser.add_argument('--database-url', help="Overrides NKP_EMS_DB_URL")
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        print(f"Hashed {migrate_passwords(get_engine(args.database_url))} plaintext password(s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+ADMIN_PAGES = ["Employee Records", "Add Employee", "Update Employee", "Attendance", "Leave Requests", "Payroll", "Reports", "Diagnostics"]
+STAFF_PAGES = ["Employee Details", "Salary", "Punch In/Out", "Leave Requests"]
+
+# Function to run fn once under tracemalloc and return its peak traced allocation in MiB
+def peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+# Function to measure a case: the first call, the median of `repeat` further calls and peak memory of one more
+def measure(fn, repeat):
+    start = time.perf_counter()
+    fn()
+    first = time.perf_counter() - start
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {'first_ms': first * 1000, 'median_ms': statistics.median(timings) * 1000, 'peak_mib': peak_memory(fn)}
+
+# Function to open a logged-in session on a page and return a callable that reruns it headlessly
+def page_session(user, is_admin, page, report_type=None):
+    from streamlit.testing.v1 import AppTest
+
+    app_test = AppTest.from_file(os.path.join(REPO, 'app.py'), default_timeout=600)
+    app_test.session_state['current_user'] = user
+    app_test.session_state['is_admin'] = is_admin
+    app_test.run()
+    app_test.sidebar.selectbox[0].set_value(page)
+    if report_type:
+        app_test.run()
+        next(box for box in app_test.selectbox if box.label == "Select Report Type").set_value(report_type)
+
+    def rerun():
+        app_test.run()
+        if app_test.exception:
+            raise RuntimeError(f"{page} raised: {app_test.exception[0].value}")
+    return rerun
+
+# Function to return a callable that submits the login form, each time as the next employee so the
+# per-username rate limit is never hit. Generated employees share one hash, so the remembered
+# verifications are dropped first to pay the key derivation every time.
+def login_session(emp_codes, password):
+    from streamlit.testing.v1 import AppTest
+
+    import auth
+
+    codes = iter(emp_codes)
+
+    def login():
+        with auth._verified_lock:
+            auth._verified.clear()
+        app_test = AppTest.from_file(os.path.join(REPO, 'app.py'), default_timeout=600)
+        app_test.run()
+        app_test.text_input[0].input(next(codes))
+        app_test.text_input[1].input(password)
+        next(button for button in app_test.button if button.label == "Login").click().run()
+        if [success.value for success in app_test.success] != ["Logged in as Employee"]:
+            raise RuntimeError(f"Login failed: {[error.value for error in app_test.error]}")
+    return login
+
+# Function to return a callable that adds one day of punches for everyone, then refreshes salaries and rollups
+def punch_day_refresh(engine, emp_codes):
+    import pandas as pd
+
+    from attendance_rollups import refresh_rollups
+    from payroll import refresh_salaries
+    from storage import run_write
+
+    days = iter(pd.bdate_range(date.today(), periods=10_000))
+
+    def refresh():
+        day = next(days).strftime('%Y-%m-%d')
+        punches = pd.DataFrame({
+            'emp_code': list(emp_codes) * 2, 'attendance_date': day,
+            'action_name': ['punchin'] * len(emp_codes) + ['punchout'] * len(emp_codes),
+            'action_time': ['08:30:00'] * len(emp_codes) + ['17:30:00'] * len(emp_codes), 'emp_desc': ''
+        })
+        run_write(engine, lambda connection: punches.to_sql('attendances', connection, index=False, if_exists='append'))
+        refresh_salaries(engine)
+        refresh_rollups(engine)
+    return refresh
+
+# Function to list (name, factory) for every benchmarked page and operation; a factory sets the
+# case up and returns the callable to time
+def cases(engine, emp_codes, args):
+    from data_access import cache
+    from reminders import run_reminder_job
+
+    staff = emp_codes[0]
+    found = [('login (cold password check)', lambda: login_session(emp_codes[1:], args.password))]
+    found += [(f"staff: {page}", lambda page=page: page_session(staff, False, page)) for page in STAFF_PAGES]
+    found += [(f"admin: {page}", lambda page=page: page_session(args.admin, True, page)) for page in ADMIN_PAGES]
+    found += [("admin: Reports / Salary Summary", lambda: page_session(args.admin, True, "Reports", "Salary Summary"))]
+
+    def cold_reports():
+        cache.clear()
+        page_session(args.admin, True, "Reports")()
+    found += [("admin: Reports, cold cache", lambda: cold_reports)]
+    found += [("refresh after a day of punches", lambda: punch_day_refresh(engine, emp_codes))]
+    found += [("reminder job", lambda: lambda: run_reminder_job(engine, sender=lambda reminder: None))]
+    return found
+
+# Function to return the current commit, so results can be compared across versions
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Function to return the last recorded run on the same dataset, if any
+def previous_run(results_path, dataset):
+    if not results_path or not os.path.exists(results_path):
+        return None
+    previous = None
+    with open(results_path, encoding='utf-8') as results_file:
+        for line in results_file:
+            record = json.loads(line)
+            if record['dataset'] == dataset:
+                previous = record
+    return previous
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every page and heavy operation on a synthetic production-sized database")
+    parser.add_argument('--employees', type=int, default=1000)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--leaves-per-employee', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--admin', default='ADMIN01')
+    parser.add_argument('--repeat', type=int, default=5, help="Timed reruns per case after the first one")
+    parser.add_argument('--only', help="Run only the cases whose name contains this text")
+    parser.add_argument('--results', default=os.path.join(REPO, 'benchmarks', 'results.jsonl'),
+                        help="JSON lines file each run is appended to and compared against ('' to disable)")
+    args = parser.parse_args()
+
+    dataset = {'employees': args.employees, 'months': args.months,
+               'leaves_per_employee': args.leaves_per_employee, 'seed': args.seed}
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'nkp_ems_db.db')
+        # The app reads these at import time, so they are set before any app module is loaded
+        os.environ['NKP_EMS_DB_URL'] = f"sqlite:///{database}"
+        os.environ['NKP_EMS_REMINDER_LOG'] = os.path.join(directory, 'reminders_outbox.jsonl')
+        from synthetic_data import generate_database
+
+        start = time.perf_counter()
+        counts = generate_database(database, args.employees, args.months, args.leaves_per_employee, args.seed, args.password)
+        print(f"dataset: {counts} generated in {time.perf_counter() - start:.1f}s\n")
+
+        os.chdir(REPO)
+        from storage import get_engine
+
+        engine = get_engine()
+        emp_codes = [f'emp{i:05d}' for i in range(1, args.employees + 1)]
+        previous = previous_run(args.results, dataset)
+
+        results = {}
+        print(f"{'case':<36} {'first (ms)':>11} {'median (ms)':>12} {'peak (MiB)':>11} {'vs last':>8}")
+        for name, make in cases(engine, emp_codes, args):
+            if args.only and args.only not in name:
+                continue
+            results[name] = measure(make(), args.repeat)
+            before = (previous or {}).get('results', {}).get(name)
+            change = f"{results[name]['median_ms'] / before['median_ms'] - 1:+.0%}" if before else '-'
+            print(f"{name:<36} {results[name]['first_ms']:>11.0f} {results[name]['median_ms']:>12.0f} "
+                  f"{results[name]['peak_mib']:>11.1f} {change:>8}")
+
+    if args.results:
+        with open(args.results, 'a', encoding='utf-8') as results_file:
+            results_file.write(json.dumps({
+                'recorded_at': datetime.now().isoformat(timespec='seconds'), 'revision': git_revision(),
+                'dataset': dataset, 'repeat': args.repeat, 'results': results
+            }) + "\n")
+        print(f"\nappended to {args.results}" + (f" (compared with {previous['revision']})" if previous else ""))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import argparse
+import os
+import sys
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from payroll import compute_monthly_salary
+
+# Function to build a synthetic attendance table with one punchin/punchout pair per employee-day
+def make_attendance(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    days = rows // 2
+    employees = max(days // 250, 1)
+    emp_codes = np.array([f'emp{i:05d}' for i in range(employees)])
+
+    emp = rng.integers(0, employees, days)
+    day = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 365, days), unit='D')
+    start = pd.to_timedelta(8 * 3600 + rng.integers(0, 3600, days), unit='s')
+    end = start + pd.to_timedelta(8 * 3600 + rng.integers(0, 7200, days), unit='s')
+
+    dates = np.repeat(day.strftime('%Y-%m-%d').to_numpy(), 2)
+    times = np.empty(days * 2, dtype=object)
+    times[0::2] = (pd.Timestamp(0) + start).strftime('%H:%M:%S')
+    times[1::2] = (pd.Timestamp(0) + end).strftime('%H:%M:%S')
+
+    attendance_data = pd.DataFrame({
+        'attendance_id': np.arange(1, days * 2 + 1),
+        'emp_code': np.repeat(emp_codes[emp], 2),
+        'attendance_date': dates,
+        'action_name': np.tile(['punchin', 'punchout'], days),
+        'action_time': times,
+        'emp_desc': ''
+    })
+    employee_data = pd.DataFrame({
+        'emp_code': emp_codes,
+        'full_name': emp_codes,
+        'hourly_rate': rng.integers(10, 40, employees)
+    })
+    return attendance_data, employee_data
+
+# Function to give every employee a mid-year raise and a few approved leaves, as the payroll rules see them
+def make_rate_history_and_leaves(employee_data, leaves_per_employee=6, seed=0):
+    rng = np.random.default_rng(seed)
+    emp_codes = employee_data['emp_code'].to_numpy()
+    rate_history = pd.concat([
+        employee_data[['emp_code', 'hourly_rate']].assign(effective_from='1900-01-01'),
+        employee_data[['emp_code']].assign(effective_from='2023-07-01', hourly_rate=employee_data['hourly_rate'] + 2)
+    ], ignore_index=True)
+
+    emp = np.repeat(emp_codes, leaves_per_employee)
+    first = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 360, len(emp)), unit='D')
+    last = first + pd.to_timedelta(rng.integers(0, 4, len(emp)), unit='D')
+    leave_data = pd.DataFrame({
+        'emp_code': emp,
+        'leave_dates': first.strftime('%Y-%m-%d') + ' to ' + last.strftime('%Y-%m-%d'),
+        'leave_type': 'Annual Leave'
+    })
+    return rate_history, leave_data
+
+# The row-wise implementation calculate_salary() used before the payroll module
+def legacy_monthly_salary(attendance_data, employee_data):
+    attendance_data = attendance_data.copy()
+    attendance_data['attendance_date'] = pd.to_datetime(attendance_data['attendance_date']).dt.date
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        attendance_data['action_time'] = pd.to_datetime(attendance_data['action_time']).dt.time
+    attendance_data['action_datetime'] = attendance_data.apply(
+        lambda row: datetime.combine(row['attendance_date'], row['action_time']),
+        axis=1
+    )
+    merged_data = pd.merge(attendance_data, employee_data, on='emp_code')
+    merged_data['time_difference'] = merged_data.groupby(['emp_code', 'attendance_date'])['action_datetime'].diff()
+    merged_data['hours_worked'] = merged_data['time_difference'].dt.total_seconds() / 3600
+    merged_data['salary'] = merged_data['hours_worked'] * merged_data['hourly_rate']
+    merged_data['attendance_date'] = pd.to_datetime(merged_data['attendance_date'])
+    merged_data['attendance_month'] = merged_data['attendance_date'].dt.strftime('%Y-%m')
+    return merged_data.groupby(['emp_code', 'attendance_month'])['salary'].sum().reset_index()
+
+# Function to time a payroll implementation, keeping the best of several runs
+def best_time(func, attendance_data, employee_data, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(attendance_data, employee_data)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the legacy and vectorized payroll computations")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--skip-legacy-above', type=int, default=None,
+                        help="Do not run the slow row-wise version above this many rows")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'legacy (s)':>12} {'vectorized (s)':>15} {'+history/leave (s)':>19} {'speedup':>9}")
+    for rows in args.sizes:
+        attendance_data, employee_data = make_attendance(rows)
+        rate_history, leave_data = make_rate_history_and_leaves(employee_data)
+        new = best_time(compute_monthly_salary, attendance_data, employee_data, args.repeat)
+        full = best_time(
+            lambda attendance, employees: compute_monthly_salary(attendance, employees, rate_history, leave_data),
+            attendance_data, employee_data, args.repeat
+        )
+        if args.skip_legacy_above is not None and rows > args.skip_legacy_above:
+            print(f"{rows:>10} {'-':>12} {new:>15.3f} {full:>19.3f} {'-':>9}")
+            continue
+        old = best_time(legacy_monthly_salary, attendance_data, employee_data, 1)
+        print(f"{rows:>10} {old:>12.3f} {new:>15.3f} {full:>19.3f} {old / new:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from payroll_store import store_salaries
+
+SALARIES_DDL = """
+    CREATE TABLE salaries (
+        salary_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        emp_code TEXT NOT NULL,
+        net_salary REAL NOT NULL,
+        salary_month TEXT NOT NULL,
+        generate_date DATETIME NOT NULL
+    )
+"""
+
+# Function to build computed monthly salaries for a number of employees over one year
+def make_monthly_salary(employees, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'emp_code': np.repeat([f'emp{i:05d}' for i in range(employees)], 12),
+        'attendance_month': np.tile([f'2023-{month:02d}' for month in range(1, 13)], employees),
+        'salary': rng.uniform(1000, 5000, employees * 12)
+    })
+
+# Function to create an empty salaries table in a scratch SQLite file
+def scratch_engine(directory, name):
+    engine = create_engine(f"sqlite:///{os.path.join(directory, name)}")
+    with engine.begin() as connection:
+        connection.execute(text(SALARIES_DDL))
+        connection.execute(text("CREATE UNIQUE INDEX ux_salaries_emp_month ON salaries (emp_code, salary_month)"))
+    return engine
+
+# The one-connection-per-row loop calculate_salary() used before the payroll store
+def legacy_store(engine, monthly_salary):
+    for index, row in monthly_salary.iterrows():
+        with engine.connect() as connection:
+            connection.execute(text("""
+                INSERT INTO salaries (emp_code, net_salary, salary_month, generate_date)
+                VALUES (:emp_code, :net_salary, :salary_month, :generate_date)
+            """), {"emp_code": row['emp_code'], "net_salary": row['salary'],
+                   "salary_month": row['attendance_month'], "generate_date": datetime.now()})
+            connection.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare row-by-row and bulk salary persistence")
+    parser.add_argument('--employees', type=int, nargs='+', default=[100, 1000, 5000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'row-by-row (s)':>15} {'bulk (s)':>10} {'speedup':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for employees in args.employees:
+            monthly_salary = make_monthly_salary(employees)
+
+            engine = scratch_engine(directory, f"legacy_{employees}.db")
+            start = time.perf_counter()
+            legacy_store(engine, monthly_salary)
+            old = time.perf_counter() - start
+            engine.dispose()
+
+            engine = scratch_engine(directory, f"bulk_{employees}.db")
+            start = time.perf_counter()
+            store_salaries(engine, monthly_salary)
+            new = time.perf_counter() - start
+            engine.dispose()
+
+            print(f"{len(monthly_salary):>8} {old:>15.3f} {new:>10.3f} {old / new:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
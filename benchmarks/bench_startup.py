@@ -0,0 +1,98 @@
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ADMIN_PAGES = ["Employee Records", "Add Employee", "Update Employee", "Attendance", "Leave Requests", "Payroll", "Reports", "Diagnostics"]
+STAFF_PAGES = ["Employee Details", "Salary", "Punch In/Out", "Leave Requests"]
+
+# Function to point the app at a scratch copy of the bundled database so benchmarks never touch it
+def scratch_environment(directory):
+    database = os.path.join(directory, 'nkp_ems_db.db')
+    shutil.copy(os.path.join(REPO, 'nkp_ems_db.db'), database)
+    os.environ['NKP_EMS_DB_URL'] = f"sqlite:///{database}"
+    os.environ['NKP_EMS_REMINDER_LOG'] = os.path.join(directory, 'reminders_outbox.jsonl')
+    return dict(os.environ)
+
+# Function to time `import app` in fresh interpreters and list the slowest imports of the last run
+def measure_import(environment, repeat, top):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                                cwd=REPO, env=environment, capture_output=True, text=True, check=True)
+        timings.append(time.perf_counter() - start)
+
+    # -X importtime prints children before their parent, one extra level of indent per nesting depth,
+    # so the direct imports of app are the depth-1 lines right before the depth-0 "app" line
+    modules, children = [], []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((int(cumulative) / 1e6, name.strip()))
+        elif depth == 0:
+            if name.strip() == 'app':
+                modules = children
+            children = []
+    return timings, sorted(modules, reverse=True)[:top]
+
+# Function to time a new session's first script run of a page, then a rerun of the same session
+def render_page(user, is_admin, page):
+    from streamlit.testing.v1 import AppTest
+
+    app_test = AppTest.from_file(os.path.join(REPO, 'app.py'), default_timeout=120)
+    if user:
+        app_test.session_state['current_user'] = user
+        app_test.session_state['is_admin'] = is_admin
+    start = time.perf_counter()
+    app_test.run()
+    if page:
+        app_test.sidebar.selectbox[0].set_value(page)
+        start = time.perf_counter()
+        app_test.run()
+    first = time.perf_counter() - start
+
+    start = time.perf_counter()
+    app_test.run()
+    rerun = time.perf_counter() - start
+    if app_test.exception:
+        raise RuntimeError(f"{page or 'Login'} raised: {app_test.exception[0].value}")
+    return first, rerun
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start and first-render latency of the Streamlit app")
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters used to time the import")
+    parser.add_argument('--top', type=int, default=10, help="Slowest top-level imports to list")
+    parser.add_argument('--admin', default='ADMIN01')
+    parser.add_argument('--staff', default='emp01')
+    args = parser.parse_args()
+
+    os.chdir(REPO)
+    sys.path.insert(0, REPO)
+    with tempfile.TemporaryDirectory() as directory:
+        environment = scratch_environment(directory)
+
+        timings, modules = measure_import(environment, args.repeat, args.top)
+        print(f"import app: median {statistics.median(timings) * 1000:.0f} ms over {len(timings)} fresh interpreters")
+        for seconds, name in modules:
+            print(f"  {seconds * 1000:8.1f} ms  {name}")
+
+        print(f"\n{'page':<32} {'first render (ms)':>18} {'rerun (ms)':>11}")
+        cases = [(None, False, None, 'Login')]
+        cases += [(args.staff, False, page, f"staff: {page}") for page in STAFF_PAGES]
+        cases += [(args.admin, True, page, f"admin: {page}") for page in ADMIN_PAGES]
+        for user, is_admin, page, label in cases:
+            first, rerun = render_page(user, is_admin, page)
+            print(f"{label:<32} {first * 1000:>18.0f} {rerun * 1000:>11.0f}")
+
+if __name__ == "__main__":
+    main()
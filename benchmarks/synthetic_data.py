@@ -0,0 +1,175 @@
+import argparse
+import os
+import shutil
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from attendance_rollups import rebuild_rollups
+from auth import hash_password
+from payroll import rebuild_salaries
+from reminders import rebuild_expiry_index
+from schema import backfill_rate_history, ensure_schema
+from storage import get_engine, run_write
+
+FIRST_NAMES = ['Ajiq', 'Abe', 'Nur', 'Siti', 'Ahmad', 'Priya', 'Wei', 'Mei', 'Rahul', 'Aisha',
+               'Daniel', 'Farah', 'Hafiz', 'Kumar', 'Lina', 'Omar', 'Ravi', 'Sara', 'Tan', 'Yusuf']
+LAST_NAMES = ['Burhanudin', 'Nata', 'Abdullah', 'Lim', 'Wong', 'Nair', 'Rahman', 'Singh', 'Chen', 'Ismail',
+              'Ong', 'Hassan', 'Pillai', 'Lee', 'Ibrahim', 'Goh', 'Das', 'Yap', 'Karim', 'Teo']
+NATIONALITIES = ['India', 'Indonesia', 'Bangladesh', 'Nepal', 'Philippines', 'Vietnam', 'Myanmar', 'China']
+VISA_TYPES = ['Single Entry Visa', 'Multiple Entry Visa', 'Transit Visa']
+VISA_STATUSES = ['Approved', 'Denied', 'Pending']
+PERMIT_TYPES = ['Employment Pass', 'Professional Visit Pass', 'Residence Pass-Talent']
+LEAVE_TYPES = ['Sick Leave', 'Casual Leave', 'Annual Leave', 'Paid', 'Unpaid']
+LEAVE_STATUSES = ['approve', 'reject', 'pending']
+
+# Tables emptied before the synthetic rows go in (admins are kept so ADMIN01/admin123 still logs in)
+GENERATED_TABLES = [
+    'employees', 'attendances', 'leaves', 'salaries', 'document_expiry', 'reminder_outbox', 'employee_rates',
+    'payroll_watermark', 'payroll_dirty', 'attendance_daily', 'attendance_rollups'
+]
+
+# Function to pick random ISO dates between two dates
+def random_dates(rng, size, start, end):
+    days = rng.integers(0, (end - start).days + 1, size)
+    return (pd.Timestamp(start) + pd.to_timedelta(days, unit='D')).strftime('%Y-%m-%d')
+
+# Function to build the employees table; every employee's password is `password`
+def make_employees(rng, count, password, today):
+    codes = np.array([f'emp{i:05d}' for i in range(1, count + 1)])
+    # One hash shared by everyone keeps generation fast while logins still pay the real key derivation
+    password_hash = hash_password(password)
+    return pd.DataFrame({
+        'emp_code': codes,
+        'emp_password': password_hash,
+        'full_name': pd.Series(rng.choice(FIRST_NAMES, count)) + ' ' + pd.Series(rng.choice(LAST_NAMES, count)),
+        'dob': random_dates(rng, count, date(1960, 1, 1), date(2004, 12, 31)),
+        'gender': rng.choice(['male', 'female'], count),
+        'nationality': rng.choice(NATIONALITIES, count),
+        'address': [f'{n} Jalan Industri' for n in rng.integers(1, 500, count)],
+        'phone_number': [f'01{n:01d}-{m:07d}' for n, m in zip(rng.integers(0, 10, count), rng.integers(0, 10**7, count))],
+        'email': [f'{code}@example.com' for code in codes],
+        'passport_number': [f'P{n:08d}' for n in rng.integers(0, 10**8, count)],
+        'passport_country': rng.choice(NATIONALITIES, count),
+        'passport_issue_date': random_dates(rng, count, date(2015, 1, 1), date(2022, 12, 31)),
+        # Expiries from a month ago to three years out, so a few percent fall in the reminder window
+        'passport_expiry_date': random_dates(rng, count, today - pd.Timedelta(days=30), today + pd.Timedelta(days=3 * 365)),
+        'visa_type': rng.choice(VISA_TYPES, count),
+        'visa_number': [f'V{n:08d}' for n in rng.integers(0, 10**8, count)],
+        'visa_issue_date': random_dates(rng, count, date(2020, 1, 1), date(2023, 12, 31)),
+        'visa_expiry_date': random_dates(rng, count, today - pd.Timedelta(days=30), today + pd.Timedelta(days=2 * 365)),
+        'visa_status': rng.choice(VISA_STATUSES, count, p=[0.85, 0.05, 0.10]),
+        'permit_type': rng.choice(PERMIT_TYPES, count),
+        'permit_number': [f'W{n:08d}' for n in rng.integers(0, 10**8, count)],
+        'permit_issue_date': random_dates(rng, count, date(2020, 1, 1), date(2023, 12, 31)),
+        'permit_expiry_date': random_dates(rng, count, today - pd.Timedelta(days=30), today + pd.Timedelta(days=2 * 365)),
+        'hourly_rate': rng.integers(10, 60, count)
+    })
+
+# Function to build punches for every weekday of the period: a punchin around 08:30, a punchout
+# 8-10 hours later, about 5% absences and 1% forgotten punchouts
+def make_attendances(rng, emp_codes, first_day, last_day):
+    workdays = pd.bdate_range(first_day, last_day)
+    emp = np.repeat(emp_codes, len(workdays))
+    day = np.tile(workdays.to_numpy(), len(emp_codes))
+    present = rng.random(len(emp)) >= 0.05
+    emp, day = emp[present], day[present]
+    shifts = len(emp)
+
+    punch_in = pd.to_timedelta(rng.normal(8.5 * 3600, 1200, shifts).clip(6 * 3600, 11 * 3600), unit='s').round('s')
+    punch_out = punch_in + pd.to_timedelta(rng.normal(9 * 3600, 1800, shifts).clip(4 * 3600, 12 * 3600), unit='s').round('s')
+    punch_out = punch_out.where(punch_out < pd.Timedelta(hours=23, minutes=59), pd.Timedelta(hours=23, minutes=59))
+    has_punchout = rng.random(shifts) >= 0.01
+
+    dates = pd.DatetimeIndex(day).strftime('%Y-%m-%d')
+    punchins = pd.DataFrame({
+        'emp_code': emp, 'attendance_date': dates, 'action_name': 'punchin',
+        'action_time': (pd.Timestamp(0) + punch_in).strftime('%H:%M:%S'), 'emp_desc': 'Arrived'
+    })
+    punchouts = pd.DataFrame({
+        'emp_code': emp[has_punchout], 'attendance_date': dates[has_punchout], 'action_name': 'punchout',
+        'action_time': (pd.Timestamp(0) + punch_out[has_punchout]).strftime('%H:%M:%S'), 'emp_desc': 'Left'
+    })
+    # Inserted in the order a day's punches would arrive
+    return pd.concat([punchins, punchouts], ignore_index=True).sort_values(
+        ['attendance_date', 'action_time'], kind='stable', ignore_index=True
+    )
+
+# Function to build leave requests, a mix of single days and short ranges in every status
+def make_leaves(rng, emp_codes, per_employee, first_day, last_day):
+    emp = np.repeat(emp_codes, per_employee)
+    count = len(emp)
+    first = pd.to_datetime(random_dates(rng, count, first_day, last_day))
+    last = first + pd.to_timedelta(rng.choice([0, 0, 0, 1, 2, 4], count), unit='D')
+    leave_dates = np.where(first == last, first.strftime('%Y-%m-%d'),
+                           first.strftime('%Y-%m-%d') + ' to ' + last.strftime('%Y-%m-%d'))
+    status = rng.choice(LEAVE_STATUSES, count, p=[0.7, 0.1, 0.2])
+    applied = (first - pd.to_timedelta(rng.integers(1, 15, count), unit='D')).strftime('%Y-%m-%d 09:00:00')
+    return pd.DataFrame({
+        'emp_code': emp,
+        'leave_subject': 'Leave request',
+        'leave_dates': leave_dates,
+        'leave_message': 'Synthetic leave request',
+        'leave_type': rng.choice(LEAVE_TYPES, count),
+        'leave_status': status,
+        'apply_date': applied,
+        'admin_approval_date': np.where(status == 'pending', None, applied)
+    })
+
+# Function to write a production-sized database to path, built on the bundled schema; returns row counts
+def generate_database(path, employees=1000, months=12, leaves_per_employee=4, seed=0, password='password', today=None):
+    rng = np.random.default_rng(seed)
+    today = pd.Timestamp(today or date.today()).normalize()
+    last_day = today - pd.Timedelta(days=1)
+    first_day = (today - pd.DateOffset(months=months)).normalize()
+
+    shutil.copy(os.path.join(REPO, 'nkp_ems_db.db'), path)
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    engine = get_engine(f"sqlite:///{path}")
+    ensure_schema(engine)
+
+    employee_data = make_employees(rng, employees, password, today)
+    attendance_data = make_attendances(rng, employee_data['emp_code'].to_numpy(), first_day, last_day)
+    leave_data = make_leaves(rng, employee_data['emp_code'].to_numpy(), leaves_per_employee, first_day, today)
+
+    def load(connection):
+        for table in GENERATED_TABLES:
+            connection.execute(text(f"DELETE FROM {table}"))
+        employee_data.to_sql('employees', connection, index=False, if_exists='append', chunksize=10_000)
+        attendance_data.to_sql('attendances', connection, index=False, if_exists='append', chunksize=50_000)
+        leave_data.to_sql('leaves', connection, index=False, if_exists='append', chunksize=10_000)
+        backfill_rate_history(connection)
+        rebuild_expiry_index(connection)
+
+    run_write(engine, load)
+    salaries = rebuild_salaries(engine)
+    rebuild_rollups(engine)
+    return {'employees': len(employee_data), 'attendances': len(attendance_data),
+            'leaves': len(leave_data), 'salaries': salaries}
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic NKP EMS database at production scale")
+    parser.add_argument('output', help="SQLite file to write (overwritten)")
+    parser.add_argument('--employees', type=int, default=1000)
+    parser.add_argument('--months', type=int, default=12, help="Months of punches up to yesterday")
+    parser.add_argument('--leaves-per-employee', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--password', default='password', help="Password of every generated employee")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = generate_database(args.output, args.employees, args.months, args.leaves_per_employee, args.seed, args.password)
+    print(", ".join(f"{count} {table}" for table, count in counts.items())
+          + f" written to {args.output} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+from sqlalchemy import text
+
+from instrumentation import annotate_last_query
+
+# Cached frames expire after this many seconds so writes from other processes become visible
+DEFAULT_TTL = 300
+
+# Upper bound on cached query results; the least recently used one is evicted first
+DEFAULT_MAX_ENTRIES = 128
+
+# Process-wide cache of query results, shared by every Streamlit session
+class QueryCache:
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    # Function to return the cached frame for key, loading it on a miss or after expiry
+    def get_or_load(self, tables, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[2].copy()
+            versions = self._snapshot(tables)
+
+        frame = loader()
+
+        with self._lock:
+            # Skip storing if one of the tables was written while the query ran
+            if self._snapshot(tables) == versions:
+                self._entries[key] = (now + self.ttl, tuple(tables), frame)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return frame.copy()
+
+    # Function to drop every cached result that reads from one of the given tables
+    def invalidate(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+            stale = [key for key, entry in self._entries.items() if set(entry[1]) & set(tables)]
+            for key in stale:
+                del self._entries[key]
+
+    # Function to return a counter that changes whenever the table is invalidated
+    def version(self, table):
+        with self._lock:
+            return self._versions.get(table, 0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _snapshot(self, tables):
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+cache = QueryCache()
+
+# Function to run a read query through the shared cache; tables lists what the query reads
+def cached_query(engine, tables, query, params=None):
+    database = str(engine.url)
+    key = (database, query, tuple(sorted((params or {}).items())))
+
+    def load():
+        frame = pd.read_sql_query(text(query), engine, params=params)
+        annotate_last_query(len(frame))
+        return frame
+    return cache.get_or_load(table_tags(engine, tables), key, load)
+
+# Cached results are tagged with (database URL, table), so processes using several databases
+# (CLIs with --database-url, benchmarks, tests) never read one database's rows for another
+def table_tags(engine, tables):
+    return [(str(engine.url), table) for table in tables]
+
+# Function to call after writing to tables of engine's database so later reads see the change
+def invalidate(engine, *tables):
+    cache.invalidate(*table_tags(engine, tables))
+
+def table_version(engine, table):
+    return cache.version(table_tags(engine, [table])[0])
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+import instrumentation
+
+# Function to show query and page timings from the in-process buffers, with Prometheus and JSONL exports
+def render_diagnostics():
+    st.subheader("Diagnostics")
+    if not instrumentation.ENABLED:
+        st.info("Instrumentation is off (NKP_EMS_DIAGNOSTICS=0).")
+        return
+
+    queries = instrumentation.query_events.snapshot()
+    pages = instrumentation.page_events.snapshot()
+    st.caption(f"Last {len(queries)} queries and {len(pages)} script runs in this server process")
+
+    st.markdown("**Script runs per page**")
+    st.dataframe(summary_frame(pages, 'page'), hide_index=True)
+
+    st.markdown("**Queries by fingerprint** (slowest total first)")
+    st.dataframe(summary_frame(queries, 'fingerprint'), hide_index=True)
+
+    st.markdown("**Slowest recent queries**")
+    slowest = sorted(queries, key=lambda item: item['duration'], reverse=True)[:20]
+    st.dataframe(pd.DataFrame([{
+        'at': datetime.fromtimestamp(item['at']).strftime('%H:%M:%S'), 'ms': round(item['duration'] * 1000, 2),
+        'rows': item['rows'], 'fingerprint': item['fingerprint'], 'statement': item['statement']
+    } for item in slowest]), hide_index=True)
+
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    export_prometheus, export_jsonl, clear = st.columns(3)
+    export_prometheus.download_button("Export Prometheus", instrumentation.prometheus_text(),
+                                      file_name=f"nkp_ems_metrics-{stamp}.prom", mime="text/plain")
+    export_jsonl.download_button("Export JSON lines", instrumentation.jsonl_text(),
+                                 file_name=f"nkp_ems_events-{stamp}.jsonl", mime="application/x-ndjson")
+    if clear.button("Clear"):
+        instrumentation.reset()
+        st.success("Diagnostics cleared")
+
+# Function to turn summarise() rows into a rounded frame
+def summary_frame(events, key):
+    summary = pd.DataFrame(instrumentation.summarise(events, key))
+    return summary.round(2) if not summary.empty else summary
@@ -0,0 +1,220 @@
+import argparse
+import csv
+import importlib.util
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+
+import streamlit as st
+from sqlalchemy import text
+
+from queries import ATTENDANCE_FILTERS, SALARY_FILTERS, as_text, filtered_query
+from storage import get_engine
+
+# Rows fetched from the database and written out at a time; only one chunk is held in memory
+CHUNK_ROWS = int(os.environ.get('NKP_EMS_EXPORT_CHUNK_ROWS', 20000))
+
+# Files for download are written here, read into the download and deleted straight away
+EXPORT_DIR = os.environ.get('NKP_EMS_EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'nkp_ems_exports'))
+
+# Streamlit serves a download from memory, so larger files are only produced by the CLI
+DOWNLOAD_LIMIT_MB = int(os.environ.get('NKP_EMS_EXPORT_DOWNLOAD_LIMIT_MB', 100))
+
+# Excel sheets stop at 1,048,576 rows; longer exports continue on another sheet
+XLSX_SHEET_ROWS = 1_048_575
+
+# Exportable tables: columns with their kind, filters from queries.py, the names of the date-range
+# parameters and an order an index already provides (so rows stream without a sort)
+EXPORTS = {
+    'salaries': {
+        'columns': [('emp_code', 'text'), ('salary_month', 'text'), ('net_salary', 'float'), ('generate_date', 'datetime')],
+        'filters': SALARY_FILTERS,
+        'range': ('start_month', 'end_month'),
+        'order_by': "emp_code, salary_month",
+    },
+    'attendances': {
+        'columns': [('attendance_id', 'int'), ('emp_code', 'text'), ('attendance_date', 'date'),
+                    ('action_name', 'text'), ('action_time', 'time'), ('emp_desc', 'text')],
+        'filters': ATTENDANCE_FILTERS,
+        'range': ('start_date', 'end_date'),
+        'order_by': "emp_code, attendance_date, action_time",
+    },
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Function to yield the filtered rows of a table in chunks of chunk_rows, fetched as they are written
+def stream_rows(engine, table, emp_code=None, start=None, end=None, chunk_rows=CHUNK_ROWS):
+    spec = EXPORTS[table]
+    start_name, end_name = spec['range']
+    # Salaries are filtered by month, so dates given for them are cut down to 'YYYY-MM'
+    width = 7 if start_name.endswith('month') else 10
+    params = {
+        'emp_code': emp_code or None,
+        start_name: as_text(start)[:width] if start else None,
+        end_name: as_text(end)[:width] if end else None,
+    }
+    query, bound = filtered_query(table, spec['filters'], params,
+                                  ", ".join(name for name, kind in spec['columns']), spec['order_by'])
+    with engine.connect().execution_options(yield_per=chunk_rows) as connection:
+        for chunk in connection.execute(text(query), bound).partitions(chunk_rows):
+            yield chunk
+
+# Function to format MySQL TIME values (timedelta) as 'HH:MM:SS' like the SQLite text
+def time_text(value):
+    if isinstance(value, timedelta):
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return value
+
+# Function to convert a stored value to the Python type of its column kind (None when it does not parse)
+def typed_value(value, kind):
+    if value is None:
+        return None
+    try:
+        if kind == 'date':
+            return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+        if kind == 'datetime':
+            return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+        if kind == 'time':
+            return time_text(value)
+        if kind == 'int':
+            return int(value)
+        if kind == 'float':
+            return float(value)
+    except ValueError:
+        return None
+    return value
+
+def write_csv(chunks, columns, path):
+    rows = 0
+    time_columns = [index for index, (name, kind) in enumerate(columns) if kind == 'time']
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        writer = csv.writer(output)
+        writer.writerow([name for name, kind in columns])
+        for chunk in chunks:
+            if time_columns:
+                chunk = [list(row) for row in chunk]
+                for row in chunk:
+                    for index in time_columns:
+                        row[index] = time_text(row[index])
+            writer.writerows(chunk)
+            rows += len(chunk)
+    return rows
+
+# Each chunk becomes one row group of the Parquet file
+def write_parquet(chunks, columns, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {'text': pa.string(), 'time': pa.string(), 'int': pa.int64(), 'float': pa.float64(),
+                   'date': pa.date32(), 'datetime': pa.timestamp('s')}
+    schema = pa.schema([(name, arrow_types[kind]) for name, kind in columns])
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pydict({
+                name: [typed_value(row[index], kind) for row in chunk] for index, (name, kind) in enumerate(columns)
+            }, schema=schema))
+            rows += len(chunk)
+        if rows == 0:
+            writer.write_table(schema.empty_table())
+    return rows
+
+# openpyxl's write-only mode streams rows to the file instead of keeping every cell in memory
+def write_xlsx(chunks, columns, path):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    header = [name for name, kind in columns]
+    sheet, sheet_rows, rows = None, XLSX_SHEET_ROWS, 0
+    for chunk in chunks:
+        for row in chunk:
+            if sheet_rows == XLSX_SHEET_ROWS:
+                sheet = workbook.create_sheet(f"Sheet{len(workbook.worksheets) + 1}")
+                sheet.append(header)
+                sheet_rows = 0
+            sheet.append([typed_value(value, kind) for value, (name, kind) in zip(row, columns)])
+            sheet_rows += 1
+        rows += len(chunk)
+    if sheet is None:
+        workbook.create_sheet("Sheet1").append(header)
+    workbook.save(path)
+    return rows
+
+WRITERS = {'csv': write_csv, 'parquet': write_parquet, 'xlsx': write_xlsx}
+
+# Module each format needs beyond the standard library
+FORMAT_MODULES = {'parquet': 'pyarrow', 'xlsx': 'openpyxl'}
+
+# Function to list the formats whose writer can be imported here
+def available_formats():
+    return [file_format for file_format in FORMATS
+            if file_format not in FORMAT_MODULES or importlib.util.find_spec(FORMAT_MODULES[file_format]) is not None]
+
+# Function to export the filtered rows of salaries or attendances to path; returns the number of rows
+def export_table(engine, table, path, file_format, emp_code=None, start=None, end=None, chunk_rows=CHUNK_ROWS):
+    chunks = stream_rows(engine, table, emp_code, start, end, chunk_rows)
+    return WRITERS[file_format](chunks, EXPORTS[table]['columns'], path)
+
+# Function to show the export form of a table: filters, format, then a download of the file. The
+# file is read only in the run that prepared it, so later reruns of the page hold nothing in memory.
+def render_export(engine, table):
+    with st.expander(f"Export {table}"):
+        # Labels are the options themselves: a format_func trips AppTest's widget state on reruns
+        file_format = st.selectbox("Format", [name.upper() for name in available_formats()],
+                                   key=f"export_{table}_format").lower()
+        emp_code = st.text_input("Employee code (blank for everyone)", key=f"export_{table}_emp").strip()
+        start = end = None
+        if st.checkbox("Limit to a period", key=f"export_{table}_limit"):
+            today = date.today()
+            period = st.date_input("Period", (today.replace(day=1), today), key=f"export_{table}_period")
+            if isinstance(period, (list, tuple)) and len(period) == 2:
+                start, end = period
+
+        if not st.button("Prepare export", key=f"export_{table}_prepare"):
+            return
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        handle, path = tempfile.mkstemp(suffix=f".{file_format}", dir=EXPORT_DIR)
+        os.close(handle)
+        try:
+            rows = export_table(engine, table, path, file_format, emp_code, start, end)
+            size_mb = os.path.getsize(path) / 2**20
+            if size_mb > DOWNLOAD_LIMIT_MB:
+                st.warning(f"{rows} row(s), {size_mb:.1f} MiB: too large to download here (limit {DOWNLOAD_LIMIT_MB} MiB). "
+                           f"Narrow the filters or run `python exports.py {table} <file>.{file_format}` on the server.")
+                return
+            with open(path, 'rb') as export_file:
+                payload = export_file.read()
+        finally:
+            os.remove(path)
+        file_name = f"{table}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{file_format}"
+        st.caption(f"{rows} row(s), {size_mb:.1f} MiB")
+        st.download_button(f"Download {file_name}", payload, file_name=file_name,
+                           mime=FORMATS[file_format], key=f"export_{table}_download")
+
+def main():
+    parser = argparse.ArgumentParser(description="Export salaries or attendances to CSV, Parquet or XLSX")
+    parser.add_argument('table', choices=sorted(EXPORTS))
+    parser.add_argument('output', help="File to write; the format is taken from its extension unless --format is given")
+    parser.add_argument('--format', choices=sorted(FORMATS))
+    parser.add_argument('--emp-code')
+    parser.add_argument('--start', help="First day (YYYY-MM-DD) or, for salaries, month (YYYY-MM) to include")
+    parser.add_argument('--end', help="Last day or month to include")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--database-url', help="Overrides NKP_EMS_DB_URL")
+    args = parser.parse_args()
+
+    file_format = args.format or os.path.splitext(args.output)[1].lstrip('.').lower()
+    if file_format not in FORMATS:
+        parser.error(f"Cannot tell the format of {args.output}; pass --format")
+    rows = export_table(get_engine(args.database_url), args.table, args.output, file_format,
+                        args.emp_code, args.start, args.end, args.chunk_rows)
+    print(f"Wrote {rows} row(s) to {args.output}")
+
+if __name__ == "__main__":
+    main()
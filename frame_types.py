@@ -0,0 +1,68 @@
+import os
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import CategoricalDtype
+
+# Set NKP_EMS_ARROW=1 to keep free-text columns in Arrow-backed strings (needs pyarrow)
+USE_ARROW = os.environ.get('NKP_EMS_ARROW') == '1'
+
+# Enum columns, with the values the MySQL schema in nkp_ems_db.sql allows
+ACTION_NAMES = CategoricalDtype(['punchin', 'punchout'])
+
+# In-memory dtype of each column, declared per table for the frames loaded in bulk (the attendance
+# rows priced by payroll.py and folded by attendance_rollups.py). Besides pandas dtypes:
+# 'date' -> datetime64, 'time' -> timedelta64 since midnight, 'text' -> Arrow string when enabled.
+# Columns not listed keep whatever the driver returned.
+TABLE_DTYPES = {
+    'attendances': {
+        'attendance_id': 'int64',
+        'emp_code': 'category',
+        'attendance_date': 'date',
+        'action_name': ACTION_NAMES,
+        'action_time': 'time',
+        'emp_desc': 'text',
+    },
+}
+
+# Function to parse a column through its distinct values only (dates and times repeat heavily)
+def parse_distinct(values, parser):
+    codes, distinct = pd.factorize(values)
+    parsed = parser(pd.Series(distinct, dtype=object)).to_numpy()
+    # Missing values get code -1, which picks the NaT appended at the end
+    parsed = np.append(parsed, np.array(['NaT'], dtype=parsed.dtype))
+    return pd.Series(parsed[codes], index=values.index, name=values.name)
+
+# Function to parse dates/datetimes given as ISO strings or date objects (as MySQL drivers return them)
+def to_datetime64(values):
+    return parse_distinct(values, lambda distinct: pd.to_datetime(distinct.astype(str), format='ISO8601', errors='coerce'))
+
+# Function to parse 'HH:MM:SS' strings or timedelta objects (MySQL TIME) into time since midnight
+def to_timedelta64(values):
+    return parse_distinct(values, lambda distinct: pd.to_timedelta(
+        distinct.map(lambda value: value if isinstance(value, timedelta) else str(value)), errors='coerce'
+    ))
+
+# Function to convert the columns of a frame read from table to their declared dtypes
+def apply_dtypes(frame, table):
+    declared = TABLE_DTYPES.get(table, {})
+    converted = {}
+    for column, dtype in declared.items():
+        if column not in frame.columns:
+            continue
+        values = frame[column]
+        if dtype == 'date':
+            converted[column] = values if pd.api.types.is_datetime64_any_dtype(values) else to_datetime64(values)
+        elif dtype == 'time':
+            converted[column] = values if pd.api.types.is_timedelta64_dtype(values) else to_timedelta64(values)
+        elif dtype == 'text':
+            if USE_ARROW:
+                converted[column] = values.astype('string[pyarrow]')
+        elif isinstance(dtype, CategoricalDtype):
+            # Values outside the enum (e.g. a typo in old data) are kept rather than turned into NaN
+            extra = set(values.dropna().unique()) - set(dtype.categories)
+            converted[column] = values.astype(CategoricalDtype(list(dtype.categories) + sorted(extra)) if extra else dtype)
+        else:
+            converted[column] = values.astype(dtype)
+    return frame.assign(**converted) if converted else frame
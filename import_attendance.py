@@ -0,0 +1,185 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+from sqlalchemy import text
+
+from data_access import invalidate
+from storage import get_engine, run_write
+
+# Rows read, validated and written per transaction
+CHUNK_SIZE = 50_000
+
+ATTENDANCE_COLUMNS = ['emp_code', 'attendance_date', 'action_name', 'action_time', 'emp_desc']
+DEDUP_KEY = ['emp_code', 'attendance_date', 'action_time']
+PUNCH_ACTIONS = ('punchin', 'punchout')
+
+STAGING_DDL = """
+    CREATE TEMPORARY TABLE IF NOT EXISTS attendance_import (
+        emp_code VARCHAR(255) NOT NULL,
+        attendance_date VARCHAR(10) NOT NULL,
+        action_name VARCHAR(16) NOT NULL,
+        action_time VARCHAR(8) NOT NULL,
+        emp_desc VARCHAR(255) NOT NULL
+    )
+"""
+
+# Only staged rows without an existing (emp_code, attendance_date, action_time) are copied;
+# the lookup uses ix_attendances_emp_date_time so nothing from attendances is held in memory
+MERGE_STAGED = """
+    INSERT INTO attendances (emp_code, attendance_date, action_name, action_time, emp_desc)
+    SELECT s.emp_code, s.attendance_date, s.action_name, s.action_time, s.emp_desc
+    FROM attendance_import s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM attendances a
+        WHERE a.emp_code = s.emp_code
+        AND a.attendance_date = s.attendance_date
+        AND a.action_time = s.action_time
+    )
+"""
+
+# Running totals of one import
+class ImportReport:
+    def __init__(self):
+        self.rows_read = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.unknown_employee = 0
+        self.invalid = 0
+        self.started = time.perf_counter()
+
+    @property
+    def rejected(self):
+        return self.unknown_employee + self.invalid
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (f"read {self.rows_read} rows in {self.seconds:.1f}s ({self.rows_per_second:,.0f} rows/s): "
+                f"{self.inserted} inserted, {self.duplicates} duplicates skipped, "
+                f"{self.rejected} rejected ({self.unknown_employee} unknown employee, {self.invalid} invalid)")
+
+# Text formats date and time cells of a Parquet file are given before validation
+PARQUET_TEXT_FORMATS = {'attendance_date': '%Y-%m-%d', 'action_time': '%H:%M:%S'}
+
+# Function to turn one column of a Parquet batch into text like the CSV path reads, keeping nulls as NA
+def parquet_text(values, column):
+    text_format = PARQUET_TEXT_FORMATS.get(column)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.strftime(text_format or '%Y-%m-%d %H:%M:%S')
+
+    def cell(value):
+        if pd.isna(value):
+            return None
+        if text_format and hasattr(value, 'strftime'):
+            return value.strftime(text_format)
+        return str(value)
+    return values.map(cell)
+
+# Function to stream a CSV or Parquet file as DataFrames of at most chunk_size rows
+def read_chunks(path, chunk_size=CHUNK_SIZE, file_format=None):
+    file_format = file_format or os.path.splitext(path)[1].lstrip('.').lower()
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        columns = [column for column in ATTENDANCE_COLUMNS if column in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            frame = batch.to_pandas()
+            yield pd.DataFrame({column: parquet_text(frame[column], column) for column in frame.columns})
+    elif file_format == 'csv':
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False)
+    else:
+        raise ValueError(f"Unsupported attendance file format: {file_format!r} (expected csv or parquet)")
+
+# Function to normalise a chunk to the attendances text formats; returns (valid rows, rejected rows)
+def validate_chunk(chunk, emp_codes):
+    missing = set(ATTENDANCE_COLUMNS) - {'emp_desc'} - set(chunk.columns)
+    if missing:
+        raise ValueError(f"Attendance file is missing columns: {', '.join(sorted(missing))}")
+
+    rows = pd.DataFrame({
+        'emp_code': chunk['emp_code'].str.strip(),
+        'attendance_date': pd.to_datetime(chunk['attendance_date'], format='ISO8601', errors='coerce').dt.strftime('%Y-%m-%d'),
+        'action_name': chunk['action_name'].str.strip().str.lower(),
+        'action_time': pd.to_datetime(chunk['action_time'], format='%H:%M:%S', errors='coerce').dt.strftime('%H:%M:%S'),
+        'emp_desc': chunk['emp_desc'].fillna('') if 'emp_desc' in chunk.columns else ''
+    })
+
+    reason = pd.Series(None, index=rows.index, dtype=object)
+    invalid = rows['attendance_date'].isna() | rows['action_time'].isna() | ~rows['action_name'].isin(PUNCH_ACTIONS)
+    reason[invalid] = 'invalid'
+    reason[~invalid & ~rows['emp_code'].isin(emp_codes)] = 'unknown_employee'
+
+    rejected = chunk[reason.notna()].assign(reject_reason=reason[reason.notna()])
+    return rows[reason.isna()], rejected
+
+# Function to write one validated chunk; returns how many rows were new
+def load_chunk(connection, rows):
+    connection.execute(text(STAGING_DDL))
+    connection.execute(text("DELETE FROM attendance_import"))
+    # Plain tuples through the driver's executemany skip SQLAlchemy's per-row parameter processing
+    placeholder = '?' if connection.dialect.paramstyle == 'qmark' else '%s'
+    connection.exec_driver_sql(
+        f"INSERT INTO attendance_import ({', '.join(ATTENDANCE_COLUMNS)}) "
+        f"VALUES ({', '.join([placeholder] * len(ATTENDANCE_COLUMNS))})",
+        list(rows[ATTENDANCE_COLUMNS].itertuples(index=False, name=None))
+    )
+    inserted = connection.execute(text(MERGE_STAGED)).rowcount
+    connection.execute(text("DELETE FROM attendance_import"))
+    return inserted
+
+# Function to import an attendance log into attendances, one transaction per chunk
+def import_attendance(path, engine=None, chunk_size=CHUNK_SIZE, file_format=None, rejects_path=None, progress=None):
+    engine = engine or get_engine()
+    emp_codes = set(pd.read_sql_query(text("SELECT emp_code FROM employees"), engine)['emp_code'])
+    report = ImportReport()
+    write_header = True
+
+    try:
+        for chunk in read_chunks(path, chunk_size, file_format):
+            rows, rejected = validate_chunk(chunk, emp_codes)
+            rows = rows.drop_duplicates(DEDUP_KEY)
+
+            report.rows_read += len(chunk)
+            report.invalid += int((rejected['reject_reason'] == 'invalid').sum())
+            report.unknown_employee += int((rejected['reject_reason'] == 'unknown_employee').sum())
+            report.duplicates += len(chunk) - len(rejected) - len(rows)
+
+            if not rows.empty:
+                inserted = run_write(engine, lambda connection: load_chunk(connection, rows))
+                report.inserted += inserted
+                report.duplicates += len(rows) - inserted
+
+            if rejects_path and not rejected.empty:
+                rejected.to_csv(rejects_path, mode='w' if write_header else 'a', header=write_header, index=False)
+                write_header = False
+            if progress:
+                progress(report)
+    finally:
+        invalidate(engine, 'attendances')
+
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import time clock attendance logs (CSV or Parquet)")
+    parser.add_argument('path', help="File with emp_code, attendance_date, action_name, action_time[, emp_desc] columns")
+    parser.add_argument('--format', dest='file_format', choices=['csv', 'parquet'], help="Defaults to the file extension")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--rejects', help="Write rejected rows with a reject_reason column to this CSV file")
+    parser.add_argument('--database-url', help="Overrides NKP_EMS_DB_URL")
+    args = parser.parse_args()
+
+    report = import_attendance(args.path, get_engine(args.database_url), args.chunk_size, args.file_format,
+                               args.rejects, progress=print)
+    print(f"Done: {report}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+from sqlalchemy import event
+
+# Set NKP_EMS_DIAGNOSTICS=0 to leave engines uninstrumented
+ENABLED = os.environ.get('NKP_EMS_DIAGNOSTICS', '1') != '0'
+
+# Most recent query and page events kept in memory for the Diagnostics page
+QUERY_CAPACITY = int(os.environ.get('NKP_EMS_DIAGNOSTICS_QUERIES', 2000))
+PAGE_CAPACITY = int(os.environ.get('NKP_EMS_DIAGNOSTICS_PAGES', 500))
+
+# Quantiles reported over the events still in the buffers
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Fixed-size, thread-safe buffer that drops the oldest event when full
+class RingBuffer:
+    def __init__(self, capacity):
+        self._events = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def append(self, item):
+        with self._lock:
+            self._events.append(item)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._events)
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+
+query_events = RingBuffer(QUERY_CAPACITY)
+page_events = RingBuffer(PAGE_CAPACITY)
+
+# Running totals since the process started (the buffers only hold the latest events), for Prometheus counters
+_totals = {'query': {}, 'page': {}}
+_totals_lock = threading.Lock()
+
+_last_query = threading.local()
+
+# Literals, then runs of placeholders (expanding IN lists, multi-row VALUES), collapse to one marker
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"\?|%s|:\w+|%\(\w+\)s")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_ROW_LIST = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+
+# Function to reduce a statement to its shape: literals and parameters become ?, whitespace collapses
+@lru_cache(maxsize=1024)
+def normalize(statement):
+    shape = " ".join(statement.split())
+    shape = _NUMBER.sub("?", _STRING.sub("?", shape))
+    shape = _PLACEHOLDER_LIST.sub("?", _PLACEHOLDER.sub("?", shape))
+    return _ROW_LIST.sub("(?)", shape)
+
+# Function to return a short stable id and the normalized text of a statement
+@lru_cache(maxsize=1024)
+def fingerprint(statement):
+    shape = normalize(statement)
+    return hashlib.sha1(shape.encode('utf-8')).hexdigest()[:12], shape
+
+# Function to attach timing listeners to an engine (storage.build_engine calls it once per engine)
+def instrument_engine(engine):
+    if not ENABLED:
+        return engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_timer(connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def record_query(connection, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - connection.info['query_started'].pop()
+        # SELECT row counts are filled in by whoever fetches the rows (see annotate_last_query)
+        if executemany:
+            rows = len(parameters)
+        else:
+            rows = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+        key, shape = fingerprint(statement)
+        record(query_events, 'query', key, {
+            'kind': 'query', 'at': time.time(), 'fingerprint': key, 'statement': shape,
+            'duration': duration, 'rows': rows, 'executemany': executemany
+        }, duration, rows)
+
+    @event.listens_for(engine, 'handle_error')
+    def drop_timer(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_started'):
+            connection.info['query_started'].pop()
+
+    return engine
+
+# Function to store an event and add it to the running totals of its key
+def record(buffer, kind, key, item, duration, rows=None):
+    buffer.append(item)
+    if kind == 'query':
+        _last_query.event = item
+    with _totals_lock:
+        totals = _totals[kind].setdefault(key, {'count': 0, 'seconds': 0.0, 'rows': 0})
+        totals['count'] += 1
+        totals['seconds'] += duration
+        totals['rows'] += rows or 0
+
+# Function to set the row count of the last statement this thread ran (for SELECTs read into a frame)
+def annotate_last_query(rows):
+    item = getattr(_last_query, 'event', None)
+    if item is None or item['rows'] is not None:
+        return
+    item['rows'] = rows
+    with _totals_lock:
+        totals = _totals['query'].get(item['fingerprint'])
+        if totals is not None:
+            totals['rows'] += rows
+
+SCRIPT_CONTROL_EXCEPTIONS = {'RerunException', 'StopException'}
+
+# Context manager timing one script run; the caller fills in timing['page'] once it is known
+@contextmanager
+def page_timer(page=None):
+    timing = {'page': page}
+    started = time.perf_counter()
+    status = 'ok'
+    try:
+        yield timing
+    except Exception as error:
+        # Streamlit's st.rerun()/st.stop() unwind through here as exceptions but are normal runs
+        status = 'ok' if type(error).__name__ in SCRIPT_CONTROL_EXCEPTIONS else 'error'
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        page = timing['page'] or 'unknown'
+        record(page_events, 'page', page, {
+            'kind': 'page', 'at': time.time(), 'page': page, 'duration': duration, 'status': status
+        }, duration)
+
+# Function to return the q-quantile of a list of numbers (nearest rank)
+def quantile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+# Function to summarise buffered events per fingerprint or page: count, mean, quantiles, max, rows
+def summarise(events, key):
+    groups = {}
+    for item in events:
+        groups.setdefault(item[key], []).append(item)
+    summary = []
+    for name, items in groups.items():
+        durations = [item['duration'] for item in items]
+        row = {key: name, 'count': len(items), 'total_ms': sum(durations) * 1000,
+               'mean_ms': sum(durations) / len(items) * 1000, 'max_ms': max(durations) * 1000}
+        row.update({f"p{int(q * 100)}_ms": quantile(durations, q) * 1000 for q in QUANTILES})
+        if key == 'fingerprint':
+            row['statement'] = items[-1]['statement']
+            row['rows'] = sum(item['rows'] or 0 for item in items)
+        summary.append(row)
+    return sorted(summary, key=lambda row: row['total_ms'], reverse=True)
+
+# Function to escape a Prometheus label value
+def label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+# Function to render the metrics in the Prometheus text exposition format. Counters run since
+# process start; quantiles cover the events still in the buffers.
+def prometheus_text():
+    with _totals_lock:
+        totals = {kind: {key: dict(values) for key, values in entries.items()} for kind, entries in _totals.items()}
+    lines = []
+    for kind, label_name, events in (('query', 'fingerprint', query_events.snapshot()),
+                                      ('page', 'page', page_events.snapshot())):
+        metric = f"nkp_ems_{kind}_duration_seconds"
+        lines.append(f"# HELP {metric} Duration of {'SQL statements' if kind == 'query' else 'script runs per page'}")
+        lines.append(f"# TYPE {metric} summary")
+        recent = {}
+        for item in events:
+            recent.setdefault(item[label_name], []).append(item['duration'])
+        for key, values in sorted(totals[kind].items()):
+            for q in QUANTILES:
+                if key in recent:
+                    lines.append(f'{metric}{{{label_name}="{label(key)}",quantile="{q}"}} {quantile(recent[key], q):.6f}')
+            lines.append(f'{metric}_sum{{{label_name}="{label(key)}"}} {values["seconds"]:.6f}')
+            lines.append(f'{metric}_count{{{label_name}="{label(key)}"}} {values["count"]}')
+        if kind == 'query':
+            lines.append("# HELP nkp_ems_query_rows_total Rows returned or affected per statement fingerprint")
+            lines.append("# TYPE nkp_ems_query_rows_total counter")
+            for key, values in sorted(totals[kind].items()):
+                lines.append(f'nkp_ems_query_rows_total{{fingerprint="{key}"}} {values["rows"]}')
+    return "\n".join(lines) + "\n"
+
+# Function to export every buffered event as JSON lines, oldest first
+def jsonl_text():
+    events = sorted(query_events.snapshot() + page_events.snapshot(), key=lambda item: item['at'])
+    return "".join(json.dumps(item) + "\n" for item in events)
+
+# Function to empty the buffers and totals
+def reset():
+    query_events.clear()
+    page_events.clear()
+    with _totals_lock:
+        for entries in _totals.values():
+            entries.clear()
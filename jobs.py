@@ -0,0 +1,268 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from data_access import invalidate
+from payroll import WRITES_COUNTER, compute_salaries_up_to, count_salary_write, read_watermark, refresh_salaries, set_watermark
+from payroll_rules import load_rules
+from payroll_store import save_salaries
+from schema import ensure_schema
+from storage import get_engine, run_write
+
+# Jobs run at the same time in this process (each one may fan out to PARTITION_WORKERS processes)
+JOB_WORKERS = int(os.environ.get('NKP_EMS_JOB_WORKERS', 2))
+
+# Processes a partitioned job spreads its employees over; 1 computes them in the job's own thread
+PARTITION_WORKERS = int(os.environ.get('NKP_EMS_JOB_PROCESSES', min(4, os.cpu_count() or 1)))
+
+# An in-flight job whose row was not touched for this long belongs to a server that died; a new
+# submission replaces it instead of waiting on it forever
+STALE_AFTER = timedelta(seconds=int(os.environ.get('NKP_EMS_JOB_STALE_AFTER', 900)))
+
+# A running job touches its row this often, so a long step (e.g. pricing one big partition) is
+# never mistaken for a dead server's job
+HEARTBEAT_INTERVAL = STALE_AFTER.total_seconds() / 5
+
+# Pages wait this long for a job before offering to check again, reading its row every POLL_INTERVAL seconds
+POLL_SECONDS = float(os.environ.get('NKP_EMS_JOB_POLL_SECONDS', 5))
+POLL_INTERVAL = 0.25
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Times a rebuild reprices from scratch after finding that a refresh stored salaries while it was pricing
+REBUILD_ATTEMPTS = 3
+
+JOB_COLUMNS = "job_id, kind, params, status, progress, message, result, error, created_at, started_at, updated_at, finished_at"
+
+logger = logging.getLogger(__name__)
+
+# Job kinds by name: each one is called as work(engine, params, report) and returns a JSON-serialisable result
+JOB_KINDS = {}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Decorator registering a function as the job kind `name`
+def job_kind(name):
+    def register(work):
+        JOB_KINDS[name] = work
+        return work
+    return register
+
+def now():
+    return datetime.now().strftime(TIME_FORMAT)
+
+# Function to return the key identical submissions share: the kind and its parameters in a stable order
+def dedupe_key(kind, params):
+    return f"{kind}:{json.dumps(params, sort_keys=True, separators=(',', ':'))}"
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='nkp-job')
+        return _executor
+
+# Function to queue a job and return its id. While an identical job is queued or running, anywhere
+# on the same database, its id is returned instead and nothing new is started.
+def submit_job(engine, kind, params=None):
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    params = params or {}
+    key = dedupe_key(kind, params)
+    job_id = uuid.uuid4().hex
+
+    def claim(connection):
+        existing = connection.execute(
+            text("SELECT job_id, updated_at FROM jobs WHERE in_flight_key = :key"), {"key": key}
+        ).first()
+        if existing is not None:
+            if datetime.now() - datetime.strptime(existing.updated_at, TIME_FORMAT) < STALE_AFTER:
+                return existing.job_id
+            finish(connection, existing.job_id, 'failed', error="Abandoned: no progress reported")
+        stamp = now()
+        connection.execute(text("""
+            INSERT INTO jobs (job_id, kind, params, in_flight_key, status, progress, created_at, updated_at)
+            VALUES (:job_id, :kind, :params, :key, 'queued', 0, :stamp, :stamp)
+        """), {"job_id": job_id, "kind": kind, "params": json.dumps(params), "key": key, "stamp": stamp})
+        return job_id
+
+    try:
+        claimed = run_write(engine, claim)
+    except IntegrityError:
+        # Another process claimed the key between our lookup and insert
+        claimed = run_write(engine, claim)
+    if claimed == job_id:
+        executor().submit(run_job, engine, job_id, kind, params)
+    return claimed
+
+# Function to run a claimed job in a pool thread and record how it ended
+def run_job(engine, job_id, kind, params):
+    run_write(engine, lambda connection: connection.execute(text("""
+        UPDATE jobs SET status = 'running', started_at = :stamp, updated_at = :stamp WHERE job_id = :job_id
+    """), {"job_id": job_id, "stamp": now()}))
+
+    def report(progress, message=None):
+        run_write(engine, lambda connection: connection.execute(text("""
+            UPDATE jobs SET progress = :progress, message = :message, updated_at = :stamp WHERE job_id = :job_id
+        """), {"job_id": job_id, "progress": min(max(float(progress), 0.0), 1.0), "message": message, "stamp": now()}))
+
+    stop_heartbeat = threading.Event()
+    threading.Thread(target=heartbeat, args=(engine, job_id, stop_heartbeat), name=f"nkp-job-heartbeat-{job_id[:8]}",
+                     daemon=True).start()
+    try:
+        result = JOB_KINDS[kind](engine, params, report)
+    except Exception as error:
+        logger.exception("Job %s (%s) failed", job_id, kind)
+        failure = f"{type(error).__name__}: {error}"
+        run_write(engine, lambda connection: finish(connection, job_id, 'failed', error=failure))
+        return
+    finally:
+        stop_heartbeat.set()
+    run_write(engine, lambda connection: finish(connection, job_id, 'done', result=result))
+
+# Function run in a thread beside a job: bump its updated_at every HEARTBEAT_INTERVAL until stopped
+def heartbeat(engine, job_id, stop, interval=None):
+    while not stop.wait(interval or HEARTBEAT_INTERVAL):
+        try:
+            run_write(engine, lambda connection: connection.execute(text(
+                "UPDATE jobs SET updated_at = :stamp WHERE job_id = :job_id AND status = 'running'"
+            ), {"job_id": job_id, "stamp": now()}))
+        except Exception:
+            logger.exception("Heartbeat of job %s failed", job_id)
+
+# Function to mark a job finished, which also releases its dedupe key
+def finish(connection, job_id, status, result=None, error=None):
+    stamp = now()
+    connection.execute(text("""
+        UPDATE jobs SET status = :status, in_flight_key = NULL, result = :result, error = :error,
+        progress = CASE WHEN :status = 'done' THEN 1 ELSE progress END, updated_at = :stamp, finished_at = :stamp
+        WHERE job_id = :job_id
+    """), {"job_id": job_id, "status": status, "result": None if result is None else json.dumps(result),
+           "error": error, "stamp": stamp})
+
+# Function to turn a jobs row into a dict with params and result decoded
+def job_record(row):
+    job = dict(row._mapping)
+    job['params'] = json.loads(job['params'])
+    job['result'] = json.loads(job['result']) if job['result'] is not None else None
+    return job
+
+# Function to read the current state of a job (not cached: pages poll it while the job runs)
+def get_job(engine, job_id):
+    with engine.connect() as connection:
+        row = connection.execute(text(f"SELECT {JOB_COLUMNS} FROM jobs WHERE job_id = :job_id"), {"job_id": job_id}).first()
+    return job_record(row) if row is not None else None
+
+# Function to list the most recent jobs, optionally of one kind
+def recent_jobs(engine, kind=None, limit=20):
+    query = f"SELECT {JOB_COLUMNS} FROM jobs" + (" WHERE kind = :kind" if kind else "") + " ORDER BY created_at DESC LIMIT :limit"
+    with engine.connect() as connection:
+        rows = connection.execute(text(query), {"kind": kind, "limit": limit}).all()
+    return [job_record(row) for row in rows]
+
+# Function to split employee codes into at most `parts` groups of similar size
+def partition(emp_codes, parts):
+    parts = max(1, min(parts, len(emp_codes)))
+    return [emp_codes[index::parts] for index in range(parts)]
+
+# Function run in a worker process: price every month of one group of employees
+def compute_partition(database_url, emp_codes, max_id, rules):
+    with get_engine(database_url).connect() as connection:
+        return compute_salaries_up_to(connection, max_id, emp_codes, rules)
+
+@job_kind('refresh_salaries')
+def refresh_salaries_job(engine, params, report):
+    report(0.0, "Pricing months touched since the last run")
+    updated = refresh_salaries(engine)
+    if updated:
+        invalidate(engine, 'salaries')
+    return {'updated': updated}
+
+# Raised inside the rebuild's store transaction when a refresh committed after the rebuild read its data
+class StaleRebuild(Exception):
+    pass
+
+# Recompute every month of every employee, with the employees partitioned over PARTITION_WORKERS
+# processes; the results are stored together in one transaction like payroll.rebuild_salaries
+@job_kind('rebuild_salaries')
+def rebuild_salaries_job(engine, params, report):
+    for attempt in range(REBUILD_ATTEMPTS):
+        try:
+            return rebuild_once(engine, report)
+        except StaleRebuild:
+            if attempt == REBUILD_ATTEMPTS - 1:
+                raise
+            report(0.0, "Salaries were refreshed meanwhile; pricing again")
+
+def rebuild_once(engine, report):
+    with engine.connect() as connection:
+        last_id = read_watermark(connection)
+        writes = read_watermark(connection, WRITES_COUNTER)
+        max_id = connection.execute(text("SELECT MAX(attendance_id) FROM attendances")).scalar() or 0
+        emp_codes = [row[0] for row in connection.execute(text("SELECT DISTINCT emp_code FROM attendances UNION SELECT emp_code FROM leaves"))]
+        dirty = pd.read_sql_query(text("SELECT emp_code, salary_month FROM payroll_dirty"), connection)
+    rules = load_rules()
+    emp_codes = sorted(code for code in emp_codes if code is not None)
+    groups = partition(emp_codes, PARTITION_WORKERS)
+    report(0.0, f"Pricing {len(emp_codes)} employees in {len(groups)} partition(s)")
+
+    url = engine.url.render_as_string(hide_password=False)
+    frames = []
+    if len(groups) <= 1:
+        frames = [compute_partition(url, group, max_id, rules) for group in groups]
+    else:
+        # Spawned rather than forked: the server process has threads (sessions, scheduler, this pool)
+        with ProcessPoolExecutor(max_workers=len(groups), mp_context=multiprocessing.get_context('spawn')) as pool:
+            pending = [pool.submit(compute_partition, url, group, max_id, rules) for group in groups]
+            for done, future in enumerate(as_completed(pending), start=1):
+                frames.append(future.result())
+                report(done / len(groups) * 0.9, f"{done} of {len(groups)} partitions priced")
+    frames = [frame for frame in frames if not frame.empty]
+    monthly_salary = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['emp_code', 'attendance_month', 'salary'])
+
+    def store(connection):
+        # A refresh that committed since we read the data may have stored newer prices, cleared
+        # dirty months or moved the watermark past max_id; writing now would undo that
+        if read_watermark(connection, WRITES_COUNTER) != writes or read_watermark(connection) != last_id:
+            raise StaleRebuild()
+        save_salaries(connection, monthly_salary)
+        # Months marked dirty after we read the data are left for the next refresh
+        if not dirty.empty:
+            connection.execute(
+                text("DELETE FROM payroll_dirty WHERE emp_code = :emp_code AND salary_month = :salary_month"),
+                dirty.to_dict('records')
+            )
+        set_watermark(connection, max_id)
+        count_salary_write(connection)
+
+    report(0.95, "Saving")
+    run_write(engine, store)
+    invalidate(engine, 'salaries')
+    return {'updated': len(monthly_salary), 'partitions': len(groups)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a background job in the foreground and print its result")
+    parser.add_argument('kind', choices=sorted(JOB_KINDS))
+    parser.add_argument('--database-url', help="Overrides NKP_EMS_DB_URL")
+    args = parser.parse_args()
+
+    engine = get_engine(args.database_url)
+    ensure_schema(engine)
+    job_id = submit_job(engine, args.kind)
+    executor().shutdown(wait=True)
+    job = get_job(engine, job_id)
+    print(f"{job['kind']} {job['status']}: {job['result'] if job['status'] == 'done' else job['error']}")
+
+if __name__ == "__main__":
+    main()
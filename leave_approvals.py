@@ -0,0 +1,48 @@
+from datetime import datetime
+
+from sqlalchemy import bindparam, text
+
+import pandas as pd
+
+from payroll_rules import leave_months, mark_months_dirty
+from storage import run_write
+
+# Status values written for each admin decision
+DECISION_STATUS = {'Approve': 'approve', 'Deny': 'reject'}
+
+# Only rows still pending are touched, so a request decided meanwhile by another admin is left alone
+DECIDE_QUERY = text("""
+    UPDATE leaves SET leave_status = :leave_status, admin_approval_date = :approval_date
+    WHERE leave_id IN :leave_ids AND leave_status = 'pending'
+""").bindparams(bindparam('leave_ids', expanding=True))
+
+APPROVED_QUERY = text("""
+    SELECT emp_code, leave_dates FROM leaves WHERE leave_id IN :leave_ids AND leave_status = 'approve'
+""").bindparams(bindparam('leave_ids', expanding=True))
+
+# Function to approve or deny leave requests in one transaction; returns how many were still pending
+def decide_leaves(engine, leave_ids, decision, approval_date=None):
+    leave_ids = [int(leave_id) for leave_id in leave_ids]
+    if not leave_ids:
+        return 0
+
+    approval_date = (approval_date or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+    params = {"leave_status": DECISION_STATUS[decision], "approval_date": approval_date, "leave_ids": leave_ids}
+
+    def decide(connection):
+        decided = connection.execute(DECIDE_QUERY, params).rowcount
+        # Approved leave may be paid, so the months it covers are priced again on the next refresh
+        if decided and params["leave_status"] == 'approve':
+            approved = pd.read_sql_query(APPROVED_QUERY, connection, params={"leave_ids": leave_ids})
+            mark_months_dirty(connection, leave_months(approved))
+        return decided
+
+    return run_write(engine, decide)
+
+# Function to format the value of st.date_input("...", []) the way leaves.leave_dates stores it
+def format_leave_dates(leave_date):
+    if not isinstance(leave_date, (list, tuple)):
+        return leave_date.isoformat()
+    if len(leave_date) == 1 or leave_date[0] == leave_date[-1]:
+        return leave_date[0].isoformat()
+    return f"{leave_date[0].isoformat()} to {leave_date[-1].isoformat()}"
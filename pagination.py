@@ -0,0 +1,141 @@
+import streamlit as st
+
+from data_access import cached_query
+from queries import EMPLOYEE_COLUMNS
+
+# Rows fetched and shown per page
+PAGE_SIZE = 50
+
+# Tables the admin pages can browse: the unique key used as seek tie-breaker, the columns shown
+# (never the password hash), the columns offered for sorting (each one has an index ending in the
+# key, see schema.py) and how each filter is applied in SQL
+PAGED_TABLES = {
+    'employees': {
+        'key': 'emp_id',
+        'columns': EMPLOYEE_COLUMNS,
+        'sort_columns': ['emp_code', 'full_name', 'nationality', 'hourly_rate',
+                         'passport_expiry_date', 'visa_expiry_date', 'permit_expiry_date'],
+        'filters': {'emp_code': 'equals', 'full_name': 'contains'},
+    },
+    'attendances': {
+        'key': 'attendance_id',
+        'columns': ['attendance_id', 'emp_code', 'attendance_date', 'action_name', 'action_time', 'emp_desc'],
+        'sort_columns': ['attendance_id', 'attendance_date', 'emp_code'],
+        'filters': {'emp_code': 'equals', 'action_name': 'equals', 'attendance_date': 'range'},
+    },
+    'salaries': {
+        'key': 'salary_id',
+        'columns': ['salary_id', 'emp_code', 'net_salary', 'salary_month', 'generate_date'],
+        'sort_columns': ['salary_id', 'salary_month', 'emp_code', 'net_salary'],
+        'filters': {'emp_code': 'equals', 'salary_month': 'range'},
+    },
+}
+
+# Function to turn filter values into WHERE clauses; range filters take a (start, end) pair
+def filter_clauses(table, filters):
+    clauses, params = [], {}
+    for column, value in (filters or {}).items():
+        kind = PAGED_TABLES[table]['filters'][column]
+        if kind == 'equals' and value:
+            clauses.append(f"{column} = :f_{column}")
+            params[f"f_{column}"] = value
+        elif kind == 'contains' and value:
+            clauses.append(f"{column} LIKE :f_{column}")
+            params[f"f_{column}"] = f"%{value}%"
+        elif kind == 'range' and value:
+            start, end = value
+            if start:
+                clauses.append(f"{column} >= :f_{column}_start")
+                params[f"f_{column}_start"] = str(start)
+            if end:
+                clauses.append(f"{column} <= :f_{column}_end")
+                params[f"f_{column}_end"] = str(end)
+    return clauses, params
+
+# Function to fetch one page with a keyset (seek) query: rows strictly after the cursor
+# (sort value, key) of the previous page's last row, so the cost does not grow with the page number.
+# Returns the page and whether another page follows.
+def fetch_page(engine, table, sort_column, descending=False, after=None, filters=None, page_size=PAGE_SIZE):
+    query, params = page_query(table, sort_column, descending, after, filters, page_size)
+    rows = cached_query(engine, [table], query, params)
+    return rows.head(page_size), len(rows) > page_size
+
+# Function to build the seek query of fetch_page; it asks for one row more than page_size to tell
+# whether another page follows
+def page_query(table, sort_column, descending=False, after=None, filters=None, page_size=PAGE_SIZE):
+    config = PAGED_TABLES[table]
+    if sort_column not in config['sort_columns']:
+        raise ValueError(f"Cannot sort {table} by {sort_column!r}")
+    key = config['key']
+    clauses, params = filter_clauses(table, filters)
+
+    if after is not None:
+        comparison = '<' if descending else '>'
+        if sort_column == key:
+            clauses.append(f"{key} {comparison} :after_key")
+        else:
+            # Row-value form, so the (sort_column, key) index serves it as a single range seek
+            clauses.append(f"({sort_column}, {key}) {comparison} (:after_sort, :after_key)")
+            params['after_sort'] = after[0]
+        params['after_key'] = after[1]
+
+    direction = 'DESC' if descending else 'ASC'
+    order_by = f"{key} {direction}" if sort_column == key else f"{sort_column} {direction}, {key} {direction}"
+    query = f"SELECT {', '.join(config['columns'])} FROM {table}"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += f" ORDER BY {order_by} LIMIT {int(page_size) + 1}"
+    return query, params
+
+# Function to render the filter inputs of a table and return the values entered
+def filter_inputs(table):
+    filters = {}
+    with st.expander("Filters"):
+        for column, kind in PAGED_TABLES[table]['filters'].items():
+            label = column.replace('_', ' ').title()
+            if column == 'action_name':
+                filters[column] = st.selectbox(label, ['', 'punchin', 'punchout'], key=f"filter_{table}_{column}")
+            elif kind == 'range':
+                start_input, end_input = st.columns(2)
+                filters[column] = (start_input.text_input(f"{label} from", key=f"filter_{table}_{column}_start"),
+                                   end_input.text_input(f"{label} to", key=f"filter_{table}_{column}_end"))
+            else:
+                filters[column] = st.text_input(label, key=f"filter_{table}_{column}")
+    return filters
+
+# Function to render a sortable, filterable table that only ever loads the page on screen
+def paginated_table(engine, table, page_size=PAGE_SIZE):
+    config = PAGED_TABLES[table]
+    state_key = f"page_cursors_{table}"
+    filters = filter_inputs(table)
+
+    sort_column_input, direction_input = st.columns([3, 1])
+    sort_column = sort_column_input.selectbox("Sort by", config['sort_columns'], key=f"sort_{table}")
+    descending = direction_input.radio("Order", ["Asc", "Desc"], horizontal=True, key=f"order_{table}") == "Desc"
+
+    # Start over from the first page whenever the sort or the filters change
+    view = (sort_column, descending, repr(filters))
+    if st.session_state.get(f"page_view_{table}") != view:
+        st.session_state[f"page_view_{table}"] = view
+        st.session_state[state_key] = [None]
+    cursors = st.session_state[state_key]
+
+    page, has_next = fetch_page(engine, table, sort_column, descending, cursors[-1], filters, page_size)
+    st.dataframe(page, hide_index=True, use_container_width=True)
+
+    previous_input, position, next_input = st.columns([1, 2, 1])
+    position.caption(f"Page {len(cursors)} ({len(page)} rows)")
+    previous_input.button("Previous", key=f"previous_{table}", disabled=len(cursors) == 1,
+                          on_click=cursors.pop)
+    next_cursor = None
+    if has_next:
+        last_row = page.iloc[-1]
+        next_cursor = (as_python(last_row[sort_column]), as_python(last_row[config['key']]))
+    next_input.button("Next", key=f"next_{table}", disabled=not has_next,
+                      on_click=cursors.append, args=(next_cursor,))
+
+    return page
+
+# numpy scalars from the DataFrame cannot be bound as query parameters
+def as_python(value):
+    return value.item() if hasattr(value, 'item') else value
@@ -0,0 +1,245 @@
+import argparse
+import os
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from data_access import cached_query
+from frame_types import apply_dtypes
+from payroll_rules import (
+    OPENING_RATE_DATE, expand_leave_days, load_rules, price_days, read_paid_leaves, read_rate_history, round_money
+)
+from payroll_store import save_salaries
+from storage import get_engine, run_write, upsert_clause
+
+# Only these employee columns are needed to price the hours worked
+RATE_COLUMNS = ['emp_code', 'hourly_rate']
+
+# Function to build one datetime64 column from the attendance date and time; frames typed by
+# frame_types.apply_dtypes are simply added, raw string columns are parsed
+def punch_timestamps(attendance_data):
+    dates, times = attendance_data['attendance_date'], attendance_data['action_time']
+    if pd.api.types.is_datetime64_any_dtype(dates) and pd.api.types.is_timedelta64_dtype(times):
+        return dates + times
+    return pd.to_datetime(
+        attendance_data['attendance_date'].astype(str) + ' ' + attendance_data['action_time'].astype(str),
+        format='ISO8601',
+        errors='coerce'
+    )
+
+# Function to truncate timestamps to the first day of their month
+def month_start(timestamps):
+    return pd.Series(timestamps.to_numpy().astype('datetime64[M]').astype('datetime64[ns]'), index=timestamps.index)
+
+# Function to turn raw attendance rows into punches sorted per employee and time
+def prepare_punches(attendance_data):
+    punches = pd.DataFrame({
+        'emp_code': attendance_data['emp_code'].to_numpy(),
+        'action_name': attendance_data['action_name'].to_numpy(),
+        'punch_time': punch_timestamps(attendance_data).to_numpy()
+    })
+    punches = punches.dropna(subset=['punch_time'])
+    punches['emp_code'] = punches['emp_code'].astype('category')
+    punches['work_date'] = punches['punch_time'].dt.normalize()
+    return punches.sort_values(['emp_code', 'punch_time'], kind='stable', ignore_index=True)
+
+# Function to pair every punchin with the punchout that directly follows it on the same day
+def pair_punches(punches):
+    # A shift is a punchin whose next event for the same employee and day is a punchout;
+    # punchout -> punchin gaps and unmatched punches are never counted
+    next_punch = punches.shift(-1)
+    is_shift = (
+        (punches['action_name'] == 'punchin')
+        & (next_punch['action_name'] == 'punchout')
+        & (next_punch['emp_code'] == punches['emp_code'])
+        & (next_punch['work_date'] == punches['work_date'])
+    )
+
+    shifts = punches.loc[is_shift, ['emp_code', 'work_date', 'punch_time']].rename(columns={'punch_time': 'punch_in'})
+    shifts['punch_out'] = next_punch.loc[is_shift, 'punch_time']
+    shifts['hours_worked'] = (shifts['punch_out'] - shifts['punch_in']).dt.total_seconds() / 3600
+    return shifts.reset_index(drop=True)
+
+# Function to compute the monthly salary of every employee from raw attendance rows, applying
+# the payroll rules: effective-dated rates, daily overtime, paid-leave credit and rounding
+def compute_monthly_salary(attendance_data, employee_data, rate_history=None, leave_data=None, rules=None):
+    rules = rules or load_rules()
+    rates = employee_data[RATE_COLUMNS].drop_duplicates('emp_code')
+    if rate_history is None:
+        rate_history = rates.assign(effective_from=OPENING_RATE_DATE)
+    punches = prepare_punches(attendance_data)
+    punches = punches[punches['emp_code'].isin(rates['emp_code'])]
+
+    leave_days = expand_leave_days(leave_data if leave_data is not None else pd.DataFrame())
+    leave_days = leave_days[leave_days['emp_code'].isin(rates['emp_code'])]
+
+    days = price_days(pair_punches(punches), leave_days, rate_history, rates, rules)
+    days['attendance_month'] = month_start(days['work_date'])
+    earned = days.groupby(['emp_code', 'attendance_month'])['salary'].sum().reset_index()
+
+    # Every (employee, month) with at least one punch or leave day gets a row, even if nothing was earned
+    months = pd.concat([
+        pd.DataFrame({'emp_code': punches['emp_code'].astype(str), 'attendance_month': month_start(punches['work_date'])}),
+        pd.DataFrame({'emp_code': leave_days['emp_code'].astype(str), 'attendance_month': month_start(leave_days['work_date'])})
+    ]).drop_duplicates()
+
+    monthly_salary = months.merge(earned, on=['emp_code', 'attendance_month'], how='left')
+    monthly_salary['salary'] = round_money(monthly_salary['salary'].fillna(0.0), rules['salary_decimals'])
+    monthly_salary = monthly_salary.sort_values(['emp_code', 'attendance_month'], ignore_index=True)
+    monthly_salary['attendance_month'] = monthly_salary['attendance_month'].dt.strftime('%Y-%m')
+    return monthly_salary
+
+# Name of the watermark row tracking the incremental salary materialization
+WATERMARK_NAME = 'salaries'
+
+# SQLite serialises writers, so attendance ids become visible in order. MySQL/InnoDB hands out
+# auto-increment ids before commit, so a row with a lower id can commit after a refresh has moved
+# past it; there, refreshes re-scan this many ids below the watermark (repricing a bucket is harmless)
+WATERMARK_RESCAN_IDS = int(os.environ.get('NKP_EMS_WATERMARK_RESCAN_IDS', 5000))
+
+# payroll_watermark row counting the transactions that wrote materialized salaries, so a job pricing
+# outside its write transaction can tell whether another write overtook it
+WRITES_COUNTER = 'salaries_writes'
+
+# Function to recompute and upsert only the (employee, month) buckets touched by new punches
+# or queued in payroll_dirty by leave approvals and rate changes
+def refresh_salaries(engine):
+    return run_write(engine, refresh_touched_months)
+
+# New punches' buckets plus the queued ones, none newer than max_id so that punches
+# arriving meanwhile are picked up by the next refresh
+TOUCHED_BUCKETS = """
+    SELECT emp_code, substr(attendance_date, 1, 7) AS salary_month FROM attendances
+    WHERE attendance_id > :last_id AND attendance_id <= :max_id
+    UNION
+    SELECT emp_code, salary_month FROM payroll_dirty
+"""
+
+def refresh_touched_months(connection):
+    last_id = read_watermark(connection)
+    max_id = max(connection.execute(text("SELECT MAX(attendance_id) FROM attendances")).scalar() or 0, last_id)
+    params = {"last_id": rescan_floor(connection, last_id), "max_id": max_id}
+    touched = pd.read_sql_query(text(TOUCHED_BUCKETS), connection, params=params)
+    if touched.empty:
+        return 0
+
+    # Reload every punch of the touched buckets
+    attendance_data = apply_dtypes(pd.read_sql_query(text(f"""
+        SELECT emp_code, attendance_date, action_name, action_time FROM attendances
+        WHERE attendance_id <= :max_id
+        AND (emp_code, substr(attendance_date, 1, 7)) IN ({TOUCHED_BUCKETS})
+    """), connection, params=params), 'attendances')
+    emp_codes = touched['emp_code'].unique().tolist()
+    rules = load_rules()
+    monthly_salary = compute_monthly_salary(
+        attendance_data,
+        pd.read_sql_query(text("SELECT emp_code, hourly_rate FROM employees"), connection),
+        read_rate_history(connection, emp_codes),
+        read_paid_leaves(connection, rules, emp_codes),
+        rules
+    )
+
+    # Leaves can span other months of the same employees; only the touched buckets are rewritten
+    touched = touched.rename(columns={'salary_month': 'attendance_month'})
+    monthly_salary = monthly_salary.merge(touched, on=['emp_code', 'attendance_month'], how='inner')
+    save_salaries(connection, monthly_salary)
+
+    # A queued bucket with nothing left to pay (e.g. after a rate change with no punches) has no salary
+    emptied = touched.merge(monthly_salary, on=['emp_code', 'attendance_month'], how='left', indicator=True)
+    emptied = emptied.loc[emptied['_merge'] == 'left_only', ['emp_code', 'attendance_month']]
+    if not emptied.empty:
+        connection.execute(
+            text("DELETE FROM salaries WHERE emp_code = :emp_code AND salary_month = :attendance_month"),
+            emptied.to_dict('records')
+        )
+    connection.execute(
+        text("DELETE FROM payroll_dirty WHERE emp_code = :emp_code AND salary_month = :attendance_month"),
+        touched.to_dict('records')
+    )
+    set_watermark(connection, max_id)
+    count_salary_write(connection)
+    return len(monthly_salary) + len(emptied)
+
+# Function to recompute every month of every employee and store it in one transaction
+# (run it after changing the payroll rules so past months are priced the same way)
+def rebuild_salaries(engine):
+    return run_write(engine, rebuild_all_months)
+
+def rebuild_all_months(connection):
+    max_id = connection.execute(text("SELECT MAX(attendance_id) FROM attendances")).scalar() or 0
+    monthly_salary = compute_salaries_up_to(connection, max_id)
+
+    save_salaries(connection, monthly_salary)
+    connection.execute(text("DELETE FROM payroll_dirty"))
+    set_watermark(connection, max_id)
+    count_salary_write(connection)
+    return len(monthly_salary)
+
+# Function to price every month from the punches up to max_id, for all employees or only some
+# (jobs.py computes employee partitions in parallel with it)
+def compute_salaries_up_to(connection, max_id, emp_codes=None, rules=None):
+    rules = rules or load_rules()
+    query = """
+        SELECT emp_code, attendance_date, action_name, action_time FROM attendances
+        WHERE attendance_id <= :max_id
+    """
+    params = {"max_id": max_id}
+    statement = text(query)
+    if emp_codes is not None:
+        statement = text(query + " AND emp_code IN :emp_codes").bindparams(bindparam('emp_codes', expanding=True))
+        params["emp_codes"] = list(emp_codes) or ['']
+    attendance_data = apply_dtypes(pd.read_sql_query(statement, connection, params=params), 'attendances')
+    return compute_monthly_salary(
+        attendance_data,
+        pd.read_sql_query(text("SELECT emp_code, hourly_rate FROM employees"), connection),
+        read_rate_history(connection, emp_codes),
+        read_paid_leaves(connection, rules, emp_codes),
+        rules
+    )
+
+# Function to return the id above which a refresh looks for new punches: the watermark itself on
+# SQLite, WATERMARK_RESCAN_IDS below it on backends whose ids can commit out of order
+def rescan_floor(connection, last_id):
+    if connection.dialect.name == 'sqlite':
+        return last_id
+    return max(last_id - WATERMARK_RESCAN_IDS, 0)
+
+# Function to return the last attendance row reflected in a materialization (0 if never run)
+def read_watermark(connection, name=WATERMARK_NAME):
+    row = connection.execute(
+        text("SELECT last_attendance_id FROM payroll_watermark WHERE name = :name"),
+        {"name": name}
+    ).first()
+    return row[0] if row else 0
+
+# Function to record the last attendance row reflected in a materialization (salaries by default)
+def set_watermark(connection, last_attendance_id, name=WATERMARK_NAME):
+    connection.execute(text(
+        "INSERT INTO payroll_watermark (name, last_attendance_id) VALUES (:name, :last_attendance_id)"
+        + upsert_clause(connection, ['name'], ['last_attendance_id'])
+    ), {"name": name, "last_attendance_id": last_attendance_id})
+
+# Function to bump WRITES_COUNTER inside a transaction that wrote salaries
+def count_salary_write(connection):
+    set_watermark(connection, read_watermark(connection, WRITES_COUNTER) + 1, WRITES_COUNTER)
+
+# Function to read the materialized monthly salaries in the shape compute_monthly_salary returns
+def read_monthly_salary(engine):
+    return cached_query(engine, ['salaries'], """
+        SELECT emp_code, salary_month AS attendance_month, net_salary AS salary
+        FROM salaries ORDER BY emp_code, salary_month
+    """)
+
+def main():
+    parser = argparse.ArgumentParser(description="Salary maintenance")
+    parser.add_argument('command', choices=['refresh', 'rebuild'],
+                        help="refresh: recompute touched months; rebuild: recompute every month with the current rules")
+    parser.add_argument('--database-url', help="Overrides NKP_EMS_DB_URL")
+    args = parser.parse_args()
+
+    engine = get_engine(args.database_url)
+    updated = refresh_salaries(engine) if args.command == 'refresh' else rebuild_salaries(engine)
+    print(f"Updated {updated} monthly salary row(s)")
+
+if __name__ == "__main__":
+    main()
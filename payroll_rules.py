@@ -0,0 +1,173 @@
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from storage import upsert_clause
+
+# Payroll rules; a JSON file named by NKP_EMS_PAYROLL_RULES can override any of them. The defaults
+# price hours as before the rules engine existed, so overtime and other paid leave types are opt-in
+# (e.g. {"daily_overtime_after_hours": 8, "overtime_multiplier": 1.5}), followed by `payroll.py rebuild`.
+DEFAULT_RULES = {
+    # Hours worked in one day beyond this threshold (None: no overtime) are paid at the overtime multiplier
+    'daily_overtime_after_hours': None,
+    'overtime_multiplier': 1.5,
+    # Approved leaves of these types are credited paid_leave_hours_per_day at the day's rate
+    'paid_leave_types': ['Paid'],
+    'paid_leave_hours_per_day': 8.0,
+    'paid_leave_skips_weekends': True,
+    # Shift durations are rounded to this many minutes (0 keeps them exact): nearest, down or up
+    'shift_rounding_minutes': 0,
+    'shift_rounding_mode': 'nearest',
+    # Monthly pay is rounded half-up to this many decimals
+    'salary_decimals': 2,
+}
+
+# Rate assumed for any day before an employee's first recorded rate change
+OPENING_RATE_DATE = '1900-01-01'
+
+# Longest leave range expanded into days; anything longer is treated as a data error
+MAX_LEAVE_DAYS = 366
+
+# Function to return the rules in force, DEFAULT_RULES overridden by the configured JSON file
+def load_rules():
+    rules = dict(DEFAULT_RULES)
+    path = os.environ.get('NKP_EMS_PAYROLL_RULES')
+    if path:
+        with open(path, encoding='utf-8') as rules_file:
+            rules.update(json.load(rules_file))
+    return rules
+
+# Function to read the effective-dated hourly rates of some employees (all of them by default)
+def read_rate_history(connection, emp_codes=None):
+    query = "SELECT emp_code, effective_from, hourly_rate FROM employee_rates"
+    if emp_codes is None:
+        return pd.read_sql_query(text(query), connection)
+    return pd.read_sql_query(
+        text(query + " WHERE emp_code IN :emp_codes").bindparams(bindparam('emp_codes', expanding=True)),
+        connection, params={"emp_codes": list(emp_codes) or ['']}
+    )
+
+# Function to record a rate that applies from effective_from onwards (today by default)
+def record_rate(connection, emp_code, hourly_rate, effective_from=None):
+    effective_from = effective_from or datetime.now().strftime('%Y-%m-%d')
+    connection.execute(text(
+        "INSERT INTO employee_rates (emp_code, effective_from, hourly_rate) VALUES (:emp_code, :effective_from, :hourly_rate)"
+        + upsert_clause(connection, ['emp_code', 'effective_from'], ['hourly_rate'])
+    ), {"emp_code": emp_code, "effective_from": effective_from, "hourly_rate": hourly_rate})
+
+# Function to queue (emp_code, 'YYYY-MM') salaries for the next refresh_salaries
+def mark_months_dirty(connection, buckets):
+    buckets = [{"emp_code": emp_code, "salary_month": salary_month} for emp_code, salary_month in buckets]
+    if buckets:
+        connection.execute(text(
+            "INSERT INTO payroll_dirty (emp_code, salary_month) VALUES (:emp_code, :salary_month)"
+            + upsert_clause(connection, ['emp_code', 'salary_month'], ['salary_month'])
+        ), buckets)
+
+# Function to read approved leaves of the paid types for some employees (all of them by default)
+def read_paid_leaves(connection, rules, emp_codes=None):
+    query = """
+        SELECT emp_code, leave_dates, leave_type FROM leaves
+        WHERE leave_status = 'approve' AND leave_type IN :leave_types
+    """
+    params = {"leave_types": list(rules['paid_leave_types'])}
+    bind_params = [bindparam('leave_types', expanding=True)]
+    if emp_codes is not None:
+        query += " AND emp_code IN :emp_codes"
+        params["emp_codes"] = list(emp_codes) or ['']
+        bind_params.append(bindparam('emp_codes', expanding=True))
+    return pd.read_sql_query(text(query).bindparams(*bind_params), connection, params=params)
+
+# Function to expand leave rows ('YYYY-MM-DD' or 'YYYY-MM-DD to YYYY-MM-DD') into one row per day
+def expand_leave_days(leave_data):
+    if leave_data.empty:
+        return pd.DataFrame({'emp_code': pd.Series(dtype=object), 'work_date': pd.Series(dtype='datetime64[ns]')})
+
+    bounds = leave_data['leave_dates'].astype(str).str.extract(r'^\s*(\S+)(?:\s+to\s+(\S+))?\s*$')
+    start = pd.to_datetime(bounds[0], format='ISO8601', errors='coerce')
+    end = pd.to_datetime(bounds[1], format='ISO8601', errors='coerce').fillna(start)
+    lengths = ((end - start).dt.days + 1).fillna(0).clip(lower=0).astype(int)
+    lengths[lengths > MAX_LEAVE_DAYS] = 0
+
+    counts = lengths.to_numpy()
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return pd.DataFrame({
+        'emp_code': np.repeat(leave_data['emp_code'].to_numpy(), counts),
+        'work_date': np.repeat(start.to_numpy(), counts) + pd.to_timedelta(offsets, unit='D').to_numpy()
+    })
+
+# Function to list the (emp_code, 'YYYY-MM') months a set of leaves falls in
+def leave_months(leave_data):
+    days = expand_leave_days(leave_data)
+    months = days['work_date'].dt.strftime('%Y-%m')
+    return sorted(set(zip(days['emp_code'], months)))
+
+# Function to attach to each row the hourly rate in force on its work_date
+def effective_rates(rows, rate_history, employee_data):
+    if rows.empty:
+        return rows.assign(hourly_rate=pd.Series(dtype=float))
+
+    history = rate_history[['emp_code', 'effective_from', 'hourly_rate']]
+    # Employees without any recorded history keep their current employees.hourly_rate
+    missing = employee_data.loc[~employee_data['emp_code'].isin(history['emp_code']), ['emp_code', 'hourly_rate']]
+    history = pd.concat([history, missing.assign(effective_from=OPENING_RATE_DATE)], ignore_index=True)
+    history['effective_from'] = pd.to_datetime(history['effective_from'].astype(str), format='ISO8601', errors='coerce')
+    history['emp_code'] = history['emp_code'].astype(str)
+    history['hourly_rate'] = history['hourly_rate'].astype(float)
+
+    rows = rows.assign(emp_code=rows['emp_code'].astype(str), _order=np.arange(len(rows)))
+    priced = pd.merge_asof(
+        rows.sort_values('work_date'),
+        history.dropna(subset=['effective_from']).sort_values('effective_from'),
+        left_on='work_date', right_on='effective_from', by='emp_code', direction='backward'
+    )
+    return priced.sort_values('_order').drop(columns=['_order', 'effective_from']).reset_index(drop=True)
+
+# Function to round shift hours as the rules say
+def round_hours(hours, rules):
+    step = rules['shift_rounding_minutes']
+    if not step:
+        return hours
+    rounder = {'nearest': np.round, 'down': np.floor, 'up': np.ceil}[rules['shift_rounding_mode']]
+    return rounder(hours * 60 / step) * step / 60
+
+# Function to round money half-up (np.round would round halves to even)
+def round_money(amount, decimals):
+    scale = 10 ** decimals
+    return np.floor(amount * scale + 0.5) / scale
+
+# Function to price a month's shifts and leave days; returns pay per (emp_code, work_date)
+def price_days(shifts, leave_days, rate_history, employee_data, rules):
+    worked = shifts.assign(hours=round_hours(shifts['hours_worked'], rules))
+    worked = worked.groupby(['emp_code', 'work_date'], observed=True, as_index=False)['hours'].sum()
+    threshold = rules['daily_overtime_after_hours']
+    if threshold is None:
+        worked['regular_hours'] = worked['hours']
+        worked['overtime_hours'] = 0.0
+    else:
+        worked['regular_hours'] = worked['hours'].clip(upper=threshold)
+        worked['overtime_hours'] = (worked['hours'] - threshold).clip(lower=0)
+    worked['leave_hours'] = 0.0
+
+    if rules['paid_leave_skips_weekends']:
+        leave_days = leave_days[leave_days['work_date'].dt.dayofweek < 5]
+    # A leave day the employee punched in on is paid for the hours worked, not also credited as leave
+    leave_days = leave_days.drop_duplicates()
+    if not worked.empty and not leave_days.empty:
+        punched = pd.MultiIndex.from_frame(worked[['emp_code', 'work_date']].astype({'emp_code': str}))
+        keys = pd.MultiIndex.from_frame(leave_days[['emp_code', 'work_date']].astype({'emp_code': str}))
+        leave_days = leave_days[~keys.isin(punched)]
+    leave = leave_days.assign(
+        hours=0.0, regular_hours=0.0, overtime_hours=0.0, leave_hours=rules['paid_leave_hours_per_day']
+    )
+
+    days = pd.concat([frame for frame in (worked, leave) if not frame.empty] or [worked], ignore_index=True)
+    days = effective_rates(days, rate_history, employee_data)
+    days['salary'] = days['hourly_rate'] * (
+        days['regular_hours'] + days['overtime_hours'] * rules['overtime_multiplier'] + days['leave_hours']
+    )
+    return days
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from sqlalchemy import text
+
+from storage import run_write, upsert_clause
+
+# Below this many rows a single executemany is cheapest; above it rows go out as multi-row INSERTs
+BULK_THRESHOLD = 1000
+
+# Rows per multi-row INSERT, keeping 4 bound parameters per row under SQLite's 999 variable limit
+BULK_CHUNK_ROWS = 200
+
+SALARY_COLUMNS = ['emp_code', 'net_salary', 'salary_month', 'generate_date']
+
+# Function to build the upsert tail keyed by the (emp_code, salary_month) unique index
+def upsert_suffix(connection):
+    return upsert_clause(connection, ['emp_code', 'salary_month'], ['net_salary', 'generate_date'])
+
+# Function to turn computed monthly salaries into parameter rows for the salaries table
+def salary_rows(monthly_salary, generate_date=None):
+    generate_date = (generate_date or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+    return [
+        {"emp_code": emp_code, "net_salary": float(salary), "salary_month": month, "generate_date": generate_date}
+        for emp_code, month, salary in monthly_salary[['emp_code', 'attendance_month', 'salary']].itertuples(index=False)
+    ]
+
+# Function to build one INSERT statement covering several rows
+def multi_row_upsert(connection, row_count):
+    values = ", ".join(
+        "(" + ", ".join(f":{column}_{i}" for column in SALARY_COLUMNS) + ")"
+        for i in range(row_count)
+    )
+    return text(f"INSERT INTO salaries ({', '.join(SALARY_COLUMNS)}) VALUES {values}" + upsert_suffix(connection))
+
+# Function to upsert monthly salaries on an open connection, inside the caller's transaction
+def save_salaries(connection, monthly_salary, generate_date=None):
+    rows = salary_rows(monthly_salary, generate_date)
+    if not rows:
+        return 0
+
+    if len(rows) <= BULK_THRESHOLD:
+        columns = ", ".join(f":{column}" for column in SALARY_COLUMNS)
+        connection.execute(
+            text(f"INSERT INTO salaries ({', '.join(SALARY_COLUMNS)}) VALUES ({columns})" + upsert_suffix(connection)),
+            rows
+        )
+        return len(rows)
+
+    full_chunk = multi_row_upsert(connection, BULK_CHUNK_ROWS)
+    for start in range(0, len(rows), BULK_CHUNK_ROWS):
+        chunk = rows[start:start + BULK_CHUNK_ROWS]
+        params = {f"{column}_{i}": row[column] for i, row in enumerate(chunk) for column in SALARY_COLUMNS}
+        statement = full_chunk if len(chunk) == BULK_CHUNK_ROWS else multi_row_upsert(connection, len(chunk))
+        connection.execute(statement, params)
+    return len(rows)
+
+# Function to persist monthly salaries in one transaction of their own
+def store_salaries(engine, monthly_salary, generate_date=None):
+    return run_write(engine, lambda connection: save_salaries(connection, monthly_salary, generate_date))
@@ -0,0 +1,172 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from data_access import invalidate
+from storage import get_engine, run_write
+
+# Flush as soon as this many punches are waiting...
+MAX_BATCH = 500
+# ...or once the oldest waiting punch is this many seconds old
+MAX_DELAY = 0.01
+# Punches held in memory before submit() blocks the caller
+MAX_PENDING = 20000
+# Seconds record() waits for its punch to be committed
+ACK_TIMEOUT = 30
+# New punches are folded into the attendance rollups at most once per this many seconds
+ROLLUP_INTERVAL = float(os.environ.get('NKP_EMS_ROLLUP_INTERVAL', 5))
+
+logger = logging.getLogger(__name__)
+
+PUNCH_ACTIONS = ('punchin', 'punchout')
+
+INSERT_PUNCH = text("""
+    INSERT INTO attendances (emp_code, attendance_date, action_name, action_time, emp_desc)
+    VALUES (:emp_code, :attendance_date, :action_name, :action_time, :emp_desc)
+""")
+
+# Buffers attendance punches and writes them to the database in group commits
+class PunchIngestor:
+    def __init__(self, engine, max_batch=MAX_BATCH, max_delay=MAX_DELAY, max_pending=MAX_PENDING,
+                 rollup_interval=ROLLUP_INTERVAL):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.rollup_interval = rollup_interval
+        self._rollups_due = False
+        self._last_rollup = 0.0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='punch-ingest', daemon=True)
+        self._thread.start()
+
+    # Function to queue one punch; the returned Future resolves once the punch is committed
+    def submit(self, emp_code, action_name, emp_desc='', punched_at=None, timeout=None):
+        if action_name not in PUNCH_ACTIONS:
+            raise ValueError(f"action_name must be one of {PUNCH_ACTIONS}, got {action_name!r}")
+        if self._stopping.is_set():
+            raise RuntimeError("Punch ingestor is closed")
+
+        punched_at = punched_at or datetime.now()
+        row = {
+            "emp_code": emp_code,
+            "attendance_date": punched_at.strftime('%Y-%m-%d'),
+            "action_name": action_name,
+            "action_time": punched_at.strftime('%H:%M:%S'),
+            "emp_desc": emp_desc or ''
+        }
+        acknowledgement = Future()
+        self._queue.put((row, acknowledgement), timeout=timeout)
+        return acknowledgement
+
+    # Function to queue one punch and wait until it is durably stored (committed and, on SQLite, fsynced)
+    def record(self, emp_code, action_name, emp_desc='', punched_at=None, timeout=ACK_TIMEOUT):
+        return self.submit(emp_code, action_name, emp_desc, punched_at, timeout=timeout).result(timeout)
+
+    # Function to queue many punches (e.g. a badge terminal upload) given as dicts
+    def submit_many(self, events, timeout=None):
+        return [
+            self.submit(event['emp_code'], event['action_name'], event.get('emp_desc', ''),
+                        event.get('punched_at'), timeout=timeout)
+            for event in events
+        ]
+
+    def pending(self):
+        return self._queue.qsize()
+
+    # Function to stop accepting punches and write out everything still queued
+    def close(self, timeout=ACK_TIMEOUT):
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                self._fold_rollups()
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._flush(batch)
+            self._fold_rollups()
+        self._fold_rollups(force=True)
+
+    # Function to fold the punches written since the last fold into the attendance rollups, after
+    # their acknowledgements so punch latency does not include it
+    def _fold_rollups(self, force=False):
+        if not self._rollups_due or (not force and time.monotonic() - self._last_rollup < self.rollup_interval):
+            return
+        # Imported here: the rollups pull in pandas and the page code
+        from attendance_rollups import refresh_rollups
+
+        self._last_rollup = time.monotonic()
+        try:
+            if refresh_rollups(self.engine):
+                invalidate(self.engine, 'attendance_daily', 'attendance_rollups')
+        except Exception:
+            logger.exception("Folding punches into the attendance rollups failed")
+            return
+        self._rollups_due = False
+
+    def _flush(self, batch):
+        rows = [row for row, _ in batch]
+        try:
+            # One fsync per batch: acknowledged punches survive a power loss or OS crash
+            run_write(self.engine, lambda connection: connection.execute(INSERT_PUNCH, rows), durable=True)
+        except IntegrityError:
+            # One bad punch must not fail its neighbours: retry them one by one
+            self._flush_individually(batch)
+        except Exception as error:
+            for _, acknowledgement in batch:
+                acknowledgement.set_exception(error)
+        else:
+            for _, acknowledgement in batch:
+                acknowledgement.set_result(True)
+        self._rollups_due = True
+        invalidate(self.engine, 'attendances')
+
+    def _flush_individually(self, batch):
+        for row, acknowledgement in batch:
+            try:
+                run_write(self.engine, lambda connection: connection.execute(INSERT_PUNCH, row), durable=True)
+            except Exception as error:
+                acknowledgement.set_exception(error)
+            else:
+                acknowledgement.set_result(True)
+
+_ingestors = {}
+_ingestors_lock = threading.Lock()
+
+# Function to return the process-wide ingestor writing to engine (the configured database by default)
+def get_ingestor(engine=None):
+    engine = engine or get_engine()
+    key = str(engine.url)
+    with _ingestors_lock:
+        if key not in _ingestors:
+            _ingestors[key] = PunchIngestor(engine)
+        return _ingestors[key]
+
+# Entry point for badge terminals: record a punch and return once it is committed
+def record_punch(emp_code, action_name, emp_desc='', punched_at=None, engine=None):
+    return get_ingestor(engine).record(emp_code, action_name, emp_desc, punched_at)
+
+@atexit.register
+def _close_ingestors():
+    for ingestor in list(_ingestors.values()):
+        ingestor.close()
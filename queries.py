@@ -0,0 +1,63 @@
+from data_access import cached_query
+
+# Function to build a filtered SELECT on one table and its parameters; filters whose value is None are left out
+def filtered_query(table, conditions, params, columns='*', order_by=None):
+    clauses = [condition for condition, name in conditions if params.get(name) is not None]
+    query = f"SELECT {columns} FROM {table}"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    if order_by:
+        query += f" ORDER BY {order_by}"
+    return query, {name: value for name, value in params.items() if value is not None}
+
+# Function to run a filtered SELECT on one table through the query cache
+def select_rows(engine, table, conditions, params, columns='*', order_by=None):
+    query, bound = filtered_query(table, conditions, params, columns, order_by)
+    return cached_query(engine, [table], query, bound)
+
+# Every employees column except emp_password: the hash never leaves the server
+EMPLOYEE_COLUMNS = ['emp_id', 'emp_code', 'full_name', 'dob', 'gender', 'nationality', 'address', 'phone_number',
+                    'email', 'passport_number', 'passport_country', 'passport_issue_date', 'passport_expiry_date',
+                    'visa_type', 'visa_number', 'visa_issue_date', 'visa_expiry_date', 'visa_status',
+                    'permit_type', 'permit_number', 'permit_issue_date', 'permit_expiry_date', 'hourly_rate']
+
+def employees(engine, emp_code=None):
+    return select_rows(engine, 'employees', [("emp_code = :emp_code", 'emp_code')], {"emp_code": emp_code},
+                       columns=", ".join(EMPLOYEE_COLUMNS))
+
+# Function to list every employee code, read from the emp_code index alone
+def employee_codes(engine):
+    return select_rows(engine, 'employees', [], {}, columns='emp_code', order_by='emp_code')['emp_code'].tolist()
+
+# Dates are 'YYYY-MM-DD' strings (or date objects) and both ends are inclusive
+ATTENDANCE_FILTERS = [
+    ("emp_code = :emp_code", 'emp_code'),
+    ("attendance_date >= :start_date", 'start_date'),
+    ("attendance_date <= :end_date", 'end_date'),
+]
+
+def attendances(engine, emp_code=None, start_date=None, end_date=None):
+    return select_rows(engine, 'attendances', ATTENDANCE_FILTERS,
+                       {"emp_code": emp_code, "start_date": as_text(start_date), "end_date": as_text(end_date)},
+                       order_by="attendance_date, action_time")
+
+def leaves(engine, emp_code=None, status=None):
+    return select_rows(engine, 'leaves', [
+        ("emp_code = :emp_code", 'emp_code'),
+        ("leave_status = :status", 'status'),
+    ], {"emp_code": emp_code, "status": status})
+
+# Months are 'YYYY-MM' strings and both ends are inclusive
+SALARY_FILTERS = [
+    ("emp_code = :emp_code", 'emp_code'),
+    ("salary_month >= :start_month", 'start_month'),
+    ("salary_month <= :end_month", 'end_month'),
+]
+
+def salaries(engine, emp_code=None, start_month=None, end_month=None):
+    return select_rows(engine, 'salaries', SALARY_FILTERS,
+                       {"emp_code": emp_code, "start_month": start_month, "end_month": end_month},
+                       order_by="emp_code, salary_month")
+
+def as_text(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
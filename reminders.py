@@ -0,0 +1,198 @@
+import json
+import logging
+import os
+import smtplib
+import threading
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from sqlalchemy import bindparam, text
+
+from data_access import cached_query, invalidate
+from storage import get_engine, run_write
+
+logger = logging.getLogger(__name__)
+
+# Document types tracked in document_expiry and the employees column each one comes from
+DOCUMENT_TYPES = {
+    'passport': 'passport_expiry_date',
+    'visa': 'visa_expiry_date',
+    'permit': 'permit_expiry_date',
+}
+
+# Documents expiring within this many days (or already expired) get a reminder
+REMINDER_WINDOW_DAYS = 30
+
+# Seconds between two runs of the scheduled reminder job
+REMINDER_INTERVAL = int(os.environ.get('NKP_EMS_REMINDER_INTERVAL', 3600))
+
+# Reminders are delivered over SMTP when NKP_EMS_SMTP_HOST is set, otherwise appended to this file
+REMINDER_LOG = os.environ.get('NKP_EMS_REMINDER_LOG', 'reminders_outbox.jsonl')
+
+REFRESH_EXPIRY_INDEX = " UNION ALL ".join(
+    f"SELECT '{doc_type}', emp_code, {column} FROM employees WHERE emp_code IN :emp_codes"
+    for doc_type, column in DOCUMENT_TYPES.items()
+)
+
+# Function to re-index the documents of some employees, inside the caller's write transaction
+def index_employee_documents(connection, emp_codes):
+    emp_codes = list(emp_codes)
+    if not emp_codes:
+        return
+    connection.execute(
+        text("DELETE FROM document_expiry WHERE emp_code IN :emp_codes").bindparams(bindparam('emp_codes', expanding=True)),
+        {"emp_codes": emp_codes}
+    )
+    connection.execute(
+        text(f"INSERT INTO document_expiry (doc_type, emp_code, expiry_date) {REFRESH_EXPIRY_INDEX}")
+        .bindparams(bindparam('emp_codes', expanding=True)),
+        {"emp_codes": emp_codes}
+    )
+
+# The expiry index as employees says it should be
+CURRENT_EXPIRY_INDEX = " UNION ALL ".join(
+    f"SELECT '{doc_type}' AS doc_type, emp_code, {column} AS expiry_date FROM employees"
+    for doc_type, column in DOCUMENT_TYPES.items()
+)
+
+# Employees whose indexed documents differ from their employees row (changed outside the app's write
+# paths, or deleted), found in SQL from the rows present on one side only
+CHANGED_EXPIRY_EMPLOYEES = f"""
+    SELECT DISTINCT emp_code FROM (
+        SELECT doc_type, emp_code, expiry_date FROM (
+            SELECT doc_type, emp_code, expiry_date FROM ({CURRENT_EXPIRY_INDEX}) AS current_index
+            EXCEPT
+            SELECT doc_type, emp_code, expiry_date FROM document_expiry
+        ) AS added
+        UNION ALL
+        SELECT doc_type, emp_code, expiry_date FROM (
+            SELECT doc_type, emp_code, expiry_date FROM document_expiry
+            EXCEPT
+            SELECT doc_type, emp_code, expiry_date FROM ({CURRENT_EXPIRY_INDEX}) AS current_index
+        ) AS removed
+    ) AS changed
+"""
+
+# Function to re-index only the employees whose documents changed; returns how many there were
+def refresh_expiry_index(connection):
+    emp_codes = [row[0] for row in connection.execute(text(CHANGED_EXPIRY_EMPLOYEES))]
+    index_employee_documents(connection, emp_codes)
+    return len(emp_codes)
+
+# Function to rebuild the whole expiry index from employees (SQL only, nothing is parsed in Python)
+def rebuild_expiry_index(connection):
+    connection.execute(text("DELETE FROM document_expiry"))
+    connection.execute(text("INSERT INTO document_expiry (doc_type, emp_code, expiry_date) " + " UNION ALL ".join(
+        f"SELECT '{doc_type}', emp_code, {column} FROM employees" for doc_type, column in DOCUMENT_TYPES.items()
+    )))
+
+# Function to list documents expiring before today + within_days with a range scan on the index
+def expiring_within(engine, within_days=REMINDER_WINDOW_DAYS, doc_type=None, today=None):
+    cutoff = ((today or datetime.now().date()) + timedelta(days=within_days)).isoformat()
+    query = """
+        SELECT d.doc_type, d.emp_code, e.full_name, d.expiry_date
+        FROM document_expiry d JOIN employees e ON e.emp_code = d.emp_code
+        WHERE d.expiry_date < :cutoff
+    """
+    params = {"cutoff": cutoff}
+    if doc_type:
+        query += " AND d.doc_type = :doc_type"
+        params["doc_type"] = doc_type
+    query += " ORDER BY d.doc_type, d.expiry_date, d.emp_code"
+    return cached_query(engine, ['document_expiry', 'employees'], query, params)
+
+# Function to queue one reminder per expiring document that has not been queued before
+def queue_reminders(connection, within_days=REMINDER_WINDOW_DAYS, today=None):
+    cutoff = ((today or datetime.now().date()) + timedelta(days=within_days)).isoformat()
+    return connection.execute(text("""
+        INSERT INTO reminder_outbox (emp_code, doc_type, expiry_date, created_at)
+        SELECT d.emp_code, d.doc_type, d.expiry_date, :created_at
+        FROM document_expiry d
+        WHERE d.expiry_date < :cutoff
+        AND NOT EXISTS (
+            SELECT 1 FROM reminder_outbox o
+            WHERE o.emp_code = d.emp_code AND o.doc_type = d.doc_type AND o.expiry_date = d.expiry_date
+        )
+    """), {"cutoff": cutoff, "created_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S')}).rowcount
+
+# Function to write a reminder to the local outbox log (stand-in for a mail server)
+def log_reminder(reminder):
+    with open(REMINDER_LOG, 'a', encoding='utf-8') as log:
+        log.write(json.dumps(reminder) + "\n")
+
+# Function to e-mail a reminder to the employee
+def email_reminder(reminder):
+    message = EmailMessage()
+    message['Subject'] = f"Your {reminder['doc_type']} expires on {reminder['expiry_date']}"
+    message['From'] = os.environ.get('NKP_EMS_SMTP_SENDER', 'no-reply@nkp-ems.local')
+    message['To'] = reminder['email']
+    message.set_content(f"Dear {reminder['full_name']},\n\nYour {reminder['doc_type']} expires on "
+                        f"{reminder['expiry_date']}. Please arrange its renewal with HR.\n")
+    with smtplib.SMTP(os.environ['NKP_EMS_SMTP_HOST'], int(os.environ.get('NKP_EMS_SMTP_PORT', 25))) as server:
+        server.send_message(message)
+
+def default_sender():
+    return email_reminder if os.environ.get('NKP_EMS_SMTP_HOST') else log_reminder
+
+# Function to send every queued reminder and mark it sent
+def deliver_reminders(engine, sender=None):
+    sender = sender or default_sender()
+    with engine.connect() as connection:
+        pending = connection.execute(text("""
+            SELECT o.emp_code, o.doc_type, o.expiry_date, e.full_name, e.email
+            FROM reminder_outbox o JOIN employees e ON e.emp_code = o.emp_code
+            WHERE o.sent_at IS NULL
+        """)).mappings().all()
+
+    sent = 0
+    for reminder in pending:
+        sender(dict(reminder))
+        run_write(engine, lambda connection: connection.execute(text("""
+            UPDATE reminder_outbox SET sent_at = :sent_at
+            WHERE emp_code = :emp_code AND doc_type = :doc_type AND expiry_date = :expiry_date
+        """), {"sent_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'), "emp_code": reminder['emp_code'],
+               "doc_type": reminder['doc_type'], "expiry_date": reminder['expiry_date']}))
+        sent += 1
+    return sent
+
+# The scheduled job: re-index employees whose documents changed, queue new reminders, deliver them
+def run_reminder_job(engine=None, sender=None):
+    engine = engine or get_engine()
+
+    def refresh(connection):
+        return refresh_expiry_index(connection), queue_reminders(connection)
+
+    reindexed, queued = run_write(engine, refresh)
+    if reindexed:
+        invalidate(engine, 'document_expiry')
+    return queued, deliver_reminders(engine, sender)
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+# Function to start (once per process and database) the background thread running the reminder job
+def start_reminder_scheduler(engine=None, interval=REMINDER_INTERVAL):
+    engine = engine or get_engine()
+    key = str(engine.url)
+    with _schedulers_lock:
+        if key in _schedulers:
+            return _schedulers[key]
+        stop = threading.Event()
+
+        def loop():
+            while True:
+                try:
+                    run_reminder_job(engine)
+                except Exception:
+                    logger.exception("Reminder job failed")
+                if stop.wait(interval):
+                    return
+
+        thread = threading.Thread(target=loop, name='reminder-job', daemon=True)
+        thread.start()
+        _schedulers[key] = stop
+        return stop
+
+if __name__ == "__main__":
+    queued, sent = run_reminder_job()
+    print(f"Queued {queued} new reminder(s), delivered {sent}")
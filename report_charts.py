@@ -0,0 +1,77 @@
+import io
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+from data_access import cached_query
+
+# Rendered PNGs kept in memory, keyed by chart name and data version
+MAX_CACHED_CHARTS = 16
+
+_rendered = OrderedDict()
+_rendered_lock = threading.Lock()
+
+# Function to return a version that changes whenever the charted data changes
+def data_version(frame):
+    return int(pd.util.hash_pandas_object(frame, index=False).sum())
+
+# Function to aggregate total salary per employee in SQL (cached until salaries is written)
+def salary_totals(engine):
+    return cached_query(engine, ['salaries'], """
+        SELECT emp_code AS "Employee", SUM(net_salary) AS "Total Salary"
+        FROM salaries GROUP BY emp_code ORDER BY emp_code
+    """)
+
+# Function to render a bar chart to PNG bytes with matplotlib's object API (no global pyplot state)
+def render_bar_png(frame, x, y, title):
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 6))
+    try:
+        axes = figure.subplots()
+        axes.bar(frame[x].astype(str), frame[y])
+        axes.set_title(title)
+        axes.set_xlabel(x)
+        axes.set_ylabel(y)
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format='png', bbox_inches='tight')
+        return buffer.getvalue()
+    finally:
+        figure.clear()
+
+# Function to return the PNG of a chart, rendering it only when its data version is new
+def cached_bar_png(name, frame, x, y, title):
+    key = (name, data_version(frame))
+    with _rendered_lock:
+        if key in _rendered:
+            _rendered.move_to_end(key)
+            return _rendered[key]
+
+    png = render_bar_png(frame, x, y, title)
+
+    with _rendered_lock:
+        _rendered[key] = png
+        while len(_rendered) > MAX_CACHED_CHARTS:
+            _rendered.popitem(last=False)
+    return png
+
+# Function to show the salary summary as a browser-rendered vector chart, with a PNG download
+def render_salary_summary(engine):
+    totals = salary_totals(engine)
+    if totals.empty:
+        st.info("No salaries to chart yet.")
+        return
+
+    st.markdown("**Total Salary Summary**")
+    st.bar_chart(totals, x='Employee', y='Total Salary')
+
+    # matplotlib is only imported once someone actually asks for the PNG
+    if st.checkbox("Prepare PNG download", key="salary_summary_png"):
+        st.download_button(
+            "Download chart (PNG)",
+            cached_bar_png('salary_summary', totals, 'Employee', 'Total Salary', 'Total Salary Summary'),
+            file_name="salary_summary.png",
+            mime="image/png"
+        )
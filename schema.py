@@ -0,0 +1,235 @@
+from sqlalchemy import text
+
+from payroll_rules import OPENING_RATE_DATE
+from reminders import rebuild_expiry_index
+
+# Idempotent DDL applied once per process before the app touches the database
+# (written to run on both SQLite and the MariaDB server nkp_ems_db.sql was dumped from)
+SCHEMA_STATEMENTS = [
+    # Remember how far into attendances the monthly salaries have been materialized
+    """
+    CREATE TABLE IF NOT EXISTS payroll_watermark (
+        name VARCHAR(64) PRIMARY KEY,
+        last_attendance_id INTEGER NOT NULL
+    )
+    """,
+    # Keep only the latest row of any (emp_code, salary_month) duplicated by earlier full recomputes
+    """
+    DELETE FROM salaries WHERE salary_id NOT IN (
+        SELECT salary_id FROM (
+            SELECT MAX(salary_id) AS salary_id FROM salaries GROUP BY emp_code, salary_month
+        ) AS latest
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_salaries_emp_month ON salaries (emp_code, salary_month)",
+    # Keys from the MySQL dump (salaries.emp_code is covered by ux_salaries_emp_month,
+    # attendances.emp_code by ix_attendances_emp_date_time)
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_admins_admin_code ON admins (admin_code)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_admins_admin_email ON admins (admin_email)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_employees_emp_code ON employees (emp_code)",
+    # Per-user and per-status views
+    # (action_time also makes the attendance import's duplicate check an exact index lookup;
+    # it replaces ix_attendances_emp_date, dropped by drop_superseded_indexes)
+    "CREATE INDEX IF NOT EXISTS ix_attendances_emp_date_time ON attendances (emp_code, attendance_date, action_time)",
+    "CREATE INDEX IF NOT EXISTS ix_leaves_emp_code ON leaves (emp_code)",
+    # Keyset pagination: one index per sort column of pagination.PAGED_TABLES, with the primary key
+    # as tie-breaker (employees.emp_code and the expiry dates are served by their single-column
+    # indexes, which end in the primary key on both SQLite and InnoDB)
+    "CREATE INDEX IF NOT EXISTS ix_attendances_attendance_date ON attendances (attendance_date, attendance_id)",
+    "CREATE INDEX IF NOT EXISTS ix_salaries_salary_month ON salaries (salary_month, salary_id)",
+    "CREATE INDEX IF NOT EXISTS ix_attendances_emp_code_id ON attendances (emp_code, attendance_id)",
+    "CREATE INDEX IF NOT EXISTS ix_salaries_emp_code_id ON salaries (emp_code, salary_id)",
+    "CREATE INDEX IF NOT EXISTS ix_salaries_net_salary_id ON salaries (net_salary, salary_id)",
+    "CREATE INDEX IF NOT EXISTS ix_employees_full_name_id ON employees (full_name, emp_id)",
+    "CREATE INDEX IF NOT EXISTS ix_employees_nationality_id ON employees (nationality, emp_id)",
+    "CREATE INDEX IF NOT EXISTS ix_employees_hourly_rate_id ON employees (hourly_rate, emp_id)",
+    "CREATE INDEX IF NOT EXISTS ix_leaves_leave_status ON leaves (leave_status)",
+    # Document expiry reminders
+    "CREATE INDEX IF NOT EXISTS ix_employees_passport_expiry ON employees (passport_expiry_date)",
+    "CREATE INDEX IF NOT EXISTS ix_employees_visa_expiry ON employees (visa_expiry_date)",
+    "CREATE INDEX IF NOT EXISTS ix_employees_permit_expiry ON employees (permit_expiry_date)",
+    # Sorted document expiry index kept in sync by the employee write paths and the reminder job
+    """
+    CREATE TABLE IF NOT EXISTS document_expiry (
+        doc_type VARCHAR(16) NOT NULL,
+        emp_code VARCHAR(255) NOT NULL,
+        expiry_date VARCHAR(10) NOT NULL,
+        PRIMARY KEY (doc_type, emp_code)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_document_expiry_lookup ON document_expiry (doc_type, expiry_date, emp_code)",
+    # One row per reminder ever queued; sent_at stays NULL until it is delivered
+    """
+    CREATE TABLE IF NOT EXISTS reminder_outbox (
+        emp_code VARCHAR(255) NOT NULL,
+        doc_type VARCHAR(16) NOT NULL,
+        expiry_date VARCHAR(10) NOT NULL,
+        created_at VARCHAR(19) NOT NULL,
+        sent_at VARCHAR(19),
+        PRIMARY KEY (emp_code, doc_type, expiry_date)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_reminder_outbox_sent_at ON reminder_outbox (sent_at)",
+    # Effective-dated hourly rates; a rate applies from effective_from until the next row
+    """
+    CREATE TABLE IF NOT EXISTS employee_rates (
+        emp_code VARCHAR(255) NOT NULL,
+        effective_from VARCHAR(10) NOT NULL,
+        hourly_rate DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (emp_code, effective_from)
+    )
+    """,
+    # (employee, month) salaries to recompute because a leave or rate changed rather than a punch
+    """
+    CREATE TABLE IF NOT EXISTS payroll_dirty (
+        emp_code VARCHAR(255) NOT NULL,
+        salary_month VARCHAR(7) NOT NULL,
+        PRIMARY KEY (emp_code, salary_month)
+    )
+    """,
+    # Attendance analytics: one row per employee and day, rolled up per week and month
+    """
+    CREATE TABLE IF NOT EXISTS attendance_daily (
+        emp_code VARCHAR(255) NOT NULL,
+        work_date VARCHAR(10) NOT NULL,
+        week_start VARCHAR(10) NOT NULL,
+        month_start VARCHAR(10) NOT NULL,
+        punches INTEGER NOT NULL,
+        first_punchin VARCHAR(8),
+        hours_worked DOUBLE PRECISION NOT NULL,
+        late_arrival INTEGER NOT NULL,
+        missing_punchouts INTEGER NOT NULL,
+        PRIMARY KEY (emp_code, work_date)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_attendance_daily_work_date ON attendance_daily (work_date)",
+    """
+    CREATE TABLE IF NOT EXISTS attendance_rollups (
+        grain VARCHAR(5) NOT NULL,
+        emp_code VARCHAR(255) NOT NULL,
+        period_start VARCHAR(10) NOT NULL,
+        days_present INTEGER NOT NULL,
+        hours_worked DOUBLE PRECISION NOT NULL,
+        late_arrivals INTEGER NOT NULL,
+        missing_punchouts INTEGER NOT NULL,
+        PRIMARY KEY (grain, emp_code, period_start)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_attendance_rollups_period ON attendance_rollups (grain, period_start)",
+    # Background jobs (see jobs.py); in_flight_key holds the dedupe key while a job is queued or running
+    # and is cleared when it finishes, so the unique index allows one in-flight job per key
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id VARCHAR(32) NOT NULL PRIMARY KEY,
+        kind VARCHAR(64) NOT NULL,
+        params TEXT NOT NULL,
+        in_flight_key VARCHAR(255),
+        status VARCHAR(10) NOT NULL,
+        progress DOUBLE PRECISION NOT NULL,
+        message VARCHAR(255),
+        result TEXT,
+        error TEXT,
+        created_at VARCHAR(19) NOT NULL,
+        started_at VARCHAR(19),
+        updated_at VARCHAR(19) NOT NULL,
+        finished_at VARCHAR(19)
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_jobs_in_flight_key ON jobs (in_flight_key)",
+    "CREATE INDEX IF NOT EXISTS ix_jobs_kind_created ON jobs (kind, created_at)",
+]
+
+# Function to fill the document expiry index the first time it is created
+def backfill_expiry_index(connection):
+    if connection.execute(text("SELECT COUNT(*) FROM document_expiry")).scalar() == 0:
+        rebuild_expiry_index(connection)
+
+# Function to seed the rate history with every employee's current rate as their opening rate
+def backfill_rate_history(connection):
+    connection.execute(text("""
+        INSERT INTO employee_rates (emp_code, effective_from, hourly_rate)
+        SELECT emp_code, :opening_date, hourly_rate FROM employees
+        WHERE hourly_rate IS NOT NULL
+        AND emp_code NOT IN (SELECT emp_code FROM employee_rates)
+    """), {"opening_date": OPENING_RATE_DATE})
+
+# Data steps that run after SCHEMA_STATEMENTS
+SCHEMA_BACKFILLS = [
+    backfill_expiry_index,
+    backfill_rate_history,
+]
+
+# Function to give leaves back its primary key after pandas' to_sql(if_exists='replace') dropped it
+def restore_leaves_primary_key(connection):
+    if connection.dialect.name != 'sqlite':
+        return
+    columns = connection.execute(text("PRAGMA table_info(leaves)")).fetchall()
+    if not columns or any(column[1] == 'leave_id' and column[5] for column in columns):
+        return
+
+    connection.execute(text("""
+        CREATE TABLE leaves_rebuilt (
+            leave_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            emp_code TEXT NOT NULL,
+            leave_subject TEXT,
+            leave_dates TEXT,
+            leave_message TEXT,
+            leave_type TEXT,
+            leave_status TEXT NOT NULL DEFAULT 'pending',
+            apply_date TEXT,
+            admin_approval_date TEXT
+        )
+    """))
+    # Rows without an id, or sharing one, are given fresh ids
+    connection.execute(text("""
+        INSERT INTO leaves_rebuilt
+        SELECT CASE WHEN leave_id IN (
+                   SELECT leave_id FROM leaves GROUP BY leave_id HAVING COUNT(*) > 1
+               ) THEN NULL ELSE leave_id END,
+               emp_code, leave_subject, leave_dates, leave_message, leave_type,
+               COALESCE(leave_status, 'pending'), apply_date, admin_approval_date
+        FROM leaves ORDER BY leave_id IS NULL, leave_id
+    """))
+    connection.execute(text("DROP TABLE leaves"))
+    connection.execute(text("ALTER TABLE leaves_rebuilt RENAME TO leaves"))
+
+# Indexes replaced by wider ones in SCHEMA_STATEMENTS, as (table, index)
+SUPERSEDED_INDEXES = [
+    ('attendances', 'ix_attendances_emp_date'),
+]
+
+# Function to drop SUPERSEDED_INDEXES; MySQL names the table in DROP INDEX and has no IF EXISTS for it
+def drop_superseded_indexes(connection):
+    for table, index in SUPERSEDED_INDEXES:
+        if connection.dialect.name == 'sqlite':
+            connection.execute(text(f"DROP INDEX IF EXISTS {index}"))
+            continue
+        exists = connection.execute(text("""
+            SELECT 1 FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = :table AND index_name = :index LIMIT 1
+        """), {"table": table, "index": index}).first()
+        if exists is not None:
+            connection.execute(text(f"DROP INDEX {index} ON {table}"))
+
+# Table rebuilds that must run before SCHEMA_STATEMENTS
+SCHEMA_MIGRATIONS = [
+    restore_leaves_primary_key,
+    drop_superseded_indexes,
+]
+
+_applied_engines = set()
+
+# Function to bring the database schema up to date (runs at most once per engine URL)
+def ensure_schema(engine):
+    key = str(engine.url)
+    if key in _applied_engines:
+        return
+
+    with engine.begin() as connection:
+        for migration in SCHEMA_MIGRATIONS:
+            migration(connection)
+        for statement in SCHEMA_STATEMENTS:
+            connection.execute(text(statement))
+        for backfill in SCHEMA_BACKFILLS:
+            backfill(connection)
+    _applied_engines.add(key)
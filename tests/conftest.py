@@ -0,0 +1,21 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from schema import ensure_schema
+from storage import get_engine
+
+# A copy of the sample database shipped with the app, migrated like the app does at start-up
+@pytest.fixture
+def engine(tmp_path):
+    path = tmp_path / 'nkp_ems_db.db'
+    shutil.copy(os.path.join(ROOT, 'nkp_ems_db.db'), path)
+    engine = get_engine(f"sqlite:///{path}")
+    ensure_schema(engine)
+    yield engine
+    engine.dispose()
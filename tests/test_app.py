@@ -0,0 +1,54 @@
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from conftest import ROOT
+
+ADMIN_PAGES = ["Employee Records", "Add Employee", "Update Employee", "Attendance", "Leave Requests", "Payroll", "Reports", "Diagnostics"]
+STAFF_PAGES = ["Employee Details", "Salary", "Punch In/Out", "Leave Requests"]
+
+# Function to open app.py headlessly on the test database as a logged-in user
+def logged_in_app(engine, monkeypatch, user, is_admin):
+    monkeypatch.setenv('NKP_EMS_DB_URL', str(engine.url))
+    app_test = AppTest.from_file(f"{ROOT}/app.py", default_timeout=60)
+    app_test.session_state['current_user'] = user
+    app_test.session_state['is_admin'] = is_admin
+    return app_test.run()
+
+# Each page is run twice: widget state that only breaks on a rerun fails here too
+@pytest.mark.parametrize('page', ADMIN_PAGES)
+def test_admin_pages_render(engine, monkeypatch, page):
+    app_test = logged_in_app(engine, monkeypatch, 'admin', True)
+    app_test.sidebar.selectbox[0].set_value(page).run()
+    app_test.run()
+    assert not app_test.exception, app_test.exception[0].value if app_test.exception else None
+
+@pytest.mark.parametrize('page', STAFF_PAGES)
+def test_staff_pages_render(engine, monkeypatch, page):
+    app_test = logged_in_app(engine, monkeypatch, 'emp01', False)
+    app_test.sidebar.selectbox[0].set_value(page).run()
+    app_test.run()
+    assert not app_test.exception, app_test.exception[0].value if app_test.exception else None
+
+def test_staff_details_do_not_show_the_password(engine, monkeypatch):
+    app_test = logged_in_app(engine, monkeypatch, 'emp01', False)
+    app_test.sidebar.selectbox[0].set_value("Employee Details").run()
+    assert 'emp_password' not in app_test.table[0].value.columns
+
+def stored_password(engine, emp_code):
+    with engine.connect() as connection:
+        return connection.exec_driver_sql("SELECT emp_password FROM employees WHERE emp_code = ?", (emp_code,)).scalar()
+
+def test_update_form_keeps_the_password_unless_a_new_one_is_typed(engine, monkeypatch):
+    before = stored_password(engine, 'emp01')
+    app_test = logged_in_app(engine, monkeypatch, 'admin', True)
+    app_test.sidebar.selectbox[0].set_value("Update Employee").run()
+    password = next(box for box in app_test.text_input if box.label.startswith("New Password"))
+    assert password.value == ""
+
+    update = next(button for button in app_test.button if button.label == "Update Employee")
+    update.click().run()
+    assert stored_password(engine, 'emp01') == before
+
+    next(box for box in app_test.text_input if box.label.startswith("New Password")).input("n3w-secret").run()
+    next(button for button in app_test.button if button.label == "Update Employee").click().run()
+    assert stored_password(engine, 'emp01').startswith('pbkdf2_sha256$')
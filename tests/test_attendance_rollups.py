@@ -0,0 +1,32 @@
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+from attendance_rollups import attendance_periods, rebuild_rollups, refresh_rollups
+from data_access import invalidate
+from punch_ingest import PunchIngestor
+
+def test_ingested_punches_are_folded_into_the_rollups(engine):
+    refresh_rollups(engine)
+    ingestor = PunchIngestor(engine, rollup_interval=0)
+    ingestor.record('emp03', 'punchin', punched_at=datetime(2024, 6, 3, 9, 0))
+    ingestor.record('emp03', 'punchout', punched_at=datetime(2024, 6, 3, 17, 30))
+    ingestor.close()
+    with engine.connect() as connection:
+        hours = connection.execute(text(
+            "SELECT hours_worked FROM attendance_daily WHERE emp_code = 'emp03' AND work_date = '2024-06-03'"
+        )).scalar()
+    assert hours == 8.5
+
+def test_incremental_refresh_matches_a_full_rebuild(engine):
+    refresh_rollups(engine)
+    with engine.begin() as connection:
+        connection.execute(text("""
+            INSERT INTO attendances (emp_code, attendance_date, action_name, action_time, emp_desc)
+            VALUES ('emp01', '2024-01-03', 'punchin', '10:00:00', ''), ('emp01', '2024-01-03', 'punchout', '12:00:00', '')
+        """))
+    refresh_rollups(engine)
+    incremental = attendance_periods(engine, 'month', date(2023, 1, 1), date(2025, 1, 1))
+    rebuild_rollups(engine)
+    invalidate(engine, 'attendance_daily', 'attendance_rollups')
+    assert attendance_periods(engine, 'month', date(2023, 1, 1), date(2025, 1, 1)).equals(incremental)
@@ -0,0 +1,57 @@
+import pytest
+
+import auth
+from auth import LoginThrottled, TokenBucketLimiter, authenticate, client_key, hash_password, verify_password
+
+def test_token_bucket_allows_a_burst_then_throttles(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(auth.time, 'monotonic', lambda: clock[0])
+    limiter = TokenBucketLimiter(capacity=2, refill_seconds=10)
+
+    assert limiter.acquire('alice') == 0
+    assert limiter.acquire('alice') == 0
+    assert limiter.acquire('alice') == pytest.approx(10)
+    # Other keys have buckets of their own
+    assert limiter.acquire('bob') == 0
+
+    clock[0] += 10
+    assert limiter.acquire('alice') == 0
+
+def test_token_bucket_evicts_least_recently_used_keys():
+    limiter = TokenBucketLimiter(capacity=1, refill_seconds=60, max_buckets=2)
+    limiter.acquire('a')
+    limiter.acquire('b')
+    limiter.acquire('c')
+    # 'a' was evicted, so it starts over with a full bucket
+    assert limiter.acquire('a') == 0
+
+def test_client_key_ignores_forwarded_for_from_untrusted_peers():
+    assert client_key('203.0.113.9', '198.51.100.1', trusted_proxies=set()) == '203.0.113.9'
+
+def test_client_key_takes_the_nearest_untrusted_hop_behind_a_trusted_proxy():
+    proxies = {'10.0.0.1', '10.0.0.2'}
+    assert client_key('10.0.0.1', 'spoofed, 198.51.100.1, 10.0.0.2', trusted_proxies=proxies) == '198.51.100.1'
+    assert client_key('10.0.0.1', None, trusted_proxies=proxies) == '10.0.0.1'
+
+def test_hashed_passwords_verify():
+    stored = hash_password('s3cret', iterations=1000)
+    assert verify_password('s3cret', stored)
+    assert not verify_password('wrong', stored)
+
+def test_authenticate_upgrades_plaintext_passwords(engine, monkeypatch):
+    monkeypatch.setattr(auth, 'PASSWORD_ITERATIONS', 1000)
+    monkeypatch.setattr(auth, 'username_limiter', TokenBucketLimiter(capacity=5, refill_seconds=30))
+    with engine.connect() as connection:
+        code, password = connection.exec_driver_sql("SELECT emp_code, emp_password FROM employees LIMIT 1").first()
+
+    assert authenticate(engine, code, password) == 'employee'
+    with engine.connect() as connection:
+        stored = connection.exec_driver_sql("SELECT emp_password FROM employees WHERE emp_code = ?", (code,)).scalar()
+    assert stored.startswith('pbkdf2_sha256$1000$')
+    assert authenticate(engine, code, 'wrong') is None
+
+def test_authenticate_throttles_repeated_attempts(engine, monkeypatch):
+    monkeypatch.setattr(auth, 'username_limiter', TokenBucketLimiter(capacity=1, refill_seconds=30))
+    authenticate(engine, 'nobody', 'x')
+    with pytest.raises(LoginThrottled):
+        authenticate(engine, 'nobody', 'x')
@@ -0,0 +1,36 @@
+import shutil
+
+from sqlalchemy import text
+
+from conftest import ROOT
+from data_access import cached_query, invalidate
+from storage import get_engine
+
+QUERY = "SELECT COUNT(*) AS n FROM employees"
+
+def count(engine):
+    return int(cached_query(engine, ['employees'], QUERY)['n'][0])
+
+def test_results_are_cached_until_invalidated(engine):
+    assert count(engine) == 3
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM employees WHERE emp_code = 'emp03'"))
+    assert count(engine) == 3
+    invalidate(engine, 'employees')
+    assert count(engine) == 2
+
+def test_each_database_has_its_own_entries(engine, tmp_path):
+    other_path = tmp_path / 'other.db'
+    shutil.copy(f"{ROOT}/nkp_ems_db.db", other_path)
+    other = get_engine(f"sqlite:///{other_path}")
+    with other.begin() as connection:
+        connection.execute(text("DELETE FROM employees"))
+
+    assert count(engine) == 3
+    assert count(other) == 0
+    # Writes to one database leave the other's cached results alone
+    invalidate(other, 'employees')
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM employees WHERE emp_code = 'emp03'"))
+    assert count(engine) == 3
+    other.dispose()
@@ -0,0 +1,50 @@
+import csv
+from datetime import date
+
+import pytest
+
+from exports import EXPORTS, available_formats, export_table
+
+def test_csv_export_streams_every_row_in_chunks(engine, tmp_path):
+    path = tmp_path / 'attendances.csv'
+    assert export_table(engine, 'attendances', path, 'csv', chunk_rows=5) == 12
+    with open(path, newline='', encoding='utf-8') as export_file:
+        rows = list(csv.DictReader(export_file))
+    assert list(rows[0]) == [name for name, kind in EXPORTS['attendances']['columns']]
+    assert len(rows) == 12
+    assert [(row['emp_code'], row['attendance_date']) for row in rows] == sorted(
+        (row['emp_code'], row['attendance_date']) for row in rows)
+
+def test_filters_by_employee_and_period(engine, tmp_path):
+    path = tmp_path / 'salaries.csv'
+    rows = export_table(engine, 'salaries', path, 'csv', emp_code='emp01', start=date(2023, 11, 5), end='2023-12-31')
+    with open(path, newline='', encoding='utf-8') as export_file:
+        months = [(row['emp_code'], row['salary_month']) for row in csv.DictReader(export_file)]
+    assert rows == len(months)
+    assert months and all(code == 'emp01' and '2023-11' <= month <= '2023-12' for code, month in months)
+
+def test_parquet_export_keeps_column_types(engine, tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = tmp_path / 'attendances.parquet'
+    assert export_table(engine, 'attendances', path, 'parquet', chunk_rows=5) == 12
+    table = pq.read_table(path)
+    assert table.num_rows == 12
+    assert str(table.schema.field('attendance_date').type) == 'date32[day]'
+    assert str(table.schema.field('attendance_id').type) == 'int64'
+    assert pq.ParquetFile(path).num_row_groups == 3
+
+def test_xlsx_export_writes_a_header_and_every_row(engine, tmp_path):
+    openpyxl = pytest.importorskip('openpyxl')
+    path = tmp_path / 'salaries.xlsx'
+    rows = export_table(engine, 'salaries', path, 'xlsx')
+    sheet = openpyxl.load_workbook(path, read_only=True).worksheets[0]
+    values = list(sheet.values)
+    assert values[0] == tuple(name for name, kind in EXPORTS['salaries']['columns'])
+    assert len(values) == rows + 1
+
+@pytest.mark.parametrize('file_format', ['csv', 'parquet', 'xlsx'])
+def test_empty_exports_still_have_a_header(engine, tmp_path, file_format):
+    if file_format not in available_formats():
+        pytest.skip(f"{file_format} writer not installed")
+    assert export_table(engine, 'attendances', tmp_path / f"none.{file_format}", file_format, emp_code='nobody') == 0
+    assert (tmp_path / f"none.{file_format}").stat().st_size > 0
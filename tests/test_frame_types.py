@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+from frame_types import apply_dtypes
+
+def test_sqlite_text_and_mysql_objects_give_the_same_typed_frame():
+    sqlite_rows = pd.DataFrame({
+        'attendance_id': [1, 2], 'emp_code': ['emp01', 'emp01'], 'attendance_date': ['2024-01-02', '2024-01-02'],
+        'action_name': ['punchin', 'punchout'], 'action_time': ['09:00:00', '17:30:00'], 'emp_desc': ['', 'x'],
+    })
+    mysql_rows = sqlite_rows.assign(
+        attendance_date=[date(2024, 1, 2)] * 2,
+        action_time=[timedelta(hours=9), timedelta(hours=17, minutes=30)],
+    )
+    typed = apply_dtypes(sqlite_rows, 'attendances')
+    pd.testing.assert_frame_equal(typed, apply_dtypes(mysql_rows, 'attendances'))
+    assert str(typed['emp_code'].dtype) == 'category'
+    assert str(typed['attendance_date'].dtype) == 'datetime64[ns]'
+    assert typed['action_time'].tolist() == [pd.Timedelta(hours=9), pd.Timedelta(hours=17, minutes=30)]
+
+def test_unknown_enum_values_are_kept():
+    typed = apply_dtypes(pd.DataFrame({'action_name': ['punchin', 'lunch']}), 'attendances')
+    assert typed['action_name'].tolist() == ['punchin', 'lunch']
+
+def test_tables_without_declared_dtypes_are_returned_as_read():
+    frame = pd.DataFrame({'emp_code': ['emp01']})
+    assert apply_dtypes(frame, 'employees') is frame
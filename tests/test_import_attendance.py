@@ -0,0 +1,45 @@
+from datetime import date, time
+
+import pytest
+from sqlalchemy import text
+
+from import_attendance import import_attendance, read_chunks
+
+def attendance_count(engine):
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT COUNT(*) FROM attendances")).scalar()
+
+def test_csv_import_skips_duplicates_and_rejects_bad_rows(engine, tmp_path):
+    path = tmp_path / 'clock.csv'
+    path.write_text(
+        "emp_code,attendance_date,action_name,action_time,emp_desc\n"
+        "emp03,2024-03-01,punchin,09:00:00,\n"
+        "emp03,2024-03-01,punchout,17:00:00,left\n"
+        "emp03,2024-03-01,punchout,17:00:00,left\n"
+        "ghost,2024-03-01,punchin,09:00:00,\n"
+        "emp03,not a date,punchin,09:00:00,\n",
+        encoding='utf-8'
+    )
+    before = attendance_count(engine)
+    report = import_attendance(str(path), engine, chunk_size=2, rejects_path=str(tmp_path / 'rejects.csv'))
+    assert (report.inserted, report.duplicates, report.unknown_employee, report.invalid) == (2, 1, 1, 1)
+    assert attendance_count(engine) == before + 2
+    # Importing the same file again inserts nothing
+    assert import_attendance(str(path), engine).inserted == 0
+
+def test_parquet_chunks_keep_nulls_and_format_dates_and_times(tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = tmp_path / 'clock.parquet'
+    pq.write_table(pa.table({
+        'emp_code': ['emp01', None],
+        'attendance_date': pa.array([date(2024, 3, 1), None], pa.date32()),
+        'action_name': ['punchin', 'punchout'],
+        'action_time': pa.array([time(9, 5, 30), time(17, 0)], pa.time64('us')),
+        'emp_desc': [None, 'left'],
+    }), path)
+
+    chunk = next(read_chunks(str(path)))
+    assert chunk.loc[0].tolist() == ['emp01', '2024-03-01', 'punchin', '09:05:30', None]
+    assert chunk.loc[1, 'emp_code'] is None
+    assert chunk.loc[1, 'attendance_date'] is None
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+
+import jobs
+from payroll import count_salary_write, read_watermark, refresh_salaries
+
+def no_report(progress, message=None):
+    pass
+
+def stored_salaries(engine):
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT emp_code, salary_month, net_salary FROM salaries")).all()
+    return {(emp_code, month): salary for emp_code, month, salary in rows}
+
+@pytest.fixture(autouse=True)
+def single_partition(monkeypatch):
+    monkeypatch.setattr(jobs, 'PARTITION_WORKERS', 1)
+
+def test_rebuild_prices_every_month_and_moves_the_watermark(engine):
+    result = jobs.rebuild_salaries_job(engine, {}, no_report)
+    with engine.connect() as connection:
+        max_id = connection.execute(text("SELECT MAX(attendance_id) FROM attendances")).scalar()
+        assert read_watermark(connection) == max_id
+    assert result['updated'] > 0
+    assert ('emp01', '2024-01') in stored_salaries(engine)
+
+def test_rebuild_reprices_when_a_refresh_commits_meanwhile(engine, monkeypatch):
+    calls = []
+    compute = jobs.compute_partition
+
+    def refresh_during_first_pricing(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            # A new punch arrives and a refresh stores it while the rebuild is pricing
+            with engine.begin() as connection:
+                connection.execute(text("""
+                    INSERT INTO attendances (emp_code, attendance_date, action_name, action_time, emp_desc)
+                    VALUES ('emp03', '2024-05-02', 'punchin', '09:00:00', ''),
+                           ('emp03', '2024-05-02', 'punchout', '11:00:00', '')
+                """))
+            refresh_salaries(engine)
+        return compute(*args)
+
+    monkeypatch.setattr(jobs, 'compute_partition', refresh_during_first_pricing)
+    jobs.rebuild_salaries_job(engine, {}, no_report)
+    assert len(calls) == 2
+    # The month the refresh stored survives the rebuild
+    assert stored_salaries(engine)[('emp03', '2024-05')] == 30.0
+
+def test_rebuild_gives_up_after_repeated_conflicts(engine, monkeypatch):
+    compute = jobs.compute_partition
+
+    def always_overtaken(*args):
+        with engine.begin() as connection:
+            count_salary_write(connection)
+        return compute(*args)
+
+    monkeypatch.setattr(jobs, 'compute_partition', always_overtaken)
+    with pytest.raises(jobs.StaleRebuild):
+        jobs.rebuild_salaries_job(engine, {}, no_report)
+
+def test_identical_submissions_share_one_job(engine, monkeypatch):
+    started = []
+    monkeypatch.setattr(jobs, 'executor', lambda: type('Pool', (), {'submit': lambda self, *args: started.append(args)})())
+    first = jobs.submit_job(engine, 'refresh_salaries')
+    assert jobs.submit_job(engine, 'refresh_salaries') == first
+    assert len(started) == 1
+    assert jobs.get_job(engine, first)['status'] == 'queued'
+
+def test_heartbeat_keeps_a_running_job_fresh(engine, monkeypatch):
+    monkeypatch.setattr(jobs, 'executor', lambda: type('Pool', (), {'submit': lambda self, *args: None})())
+    job_id = jobs.submit_job(engine, 'refresh_salaries')
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE jobs SET status = 'running', updated_at = '2000-01-01 00:00:00' WHERE job_id = :job_id"),
+                           {"job_id": job_id})
+
+    stop = threading.Event()
+    beat = threading.Thread(target=jobs.heartbeat, args=(engine, job_id, stop, 0.01))
+    beat.start()
+    time.sleep(0.2)
+    stop.set()
+    beat.join()
+    assert jobs.get_job(engine, job_id)['updated_at'] > '2000-01-01 00:00:00'
+
+def test_failed_jobs_are_logged_and_recorded(engine, monkeypatch, caplog):
+    monkeypatch.setitem(jobs.JOB_KINDS, 'explode', lambda engine, params, report: 1 / 0)
+    monkeypatch.setattr(jobs, 'executor', lambda: type('Pool', (), {'submit': lambda self, *args: None})())
+    job_id = jobs.submit_job(engine, 'explode')
+    jobs.run_job(engine, job_id, 'explode', {})
+    job = jobs.get_job(engine, job_id)
+    assert (job['status'], job['error']) == ('failed', 'ZeroDivisionError: division by zero')
+    assert any(record.name == 'jobs' and record.exc_info for record in caplog.records)
@@ -0,0 +1,33 @@
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+from leave_approvals import decide_leaves, format_leave_dates
+
+def leave_status(engine, leave_id):
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT leave_status FROM leaves WHERE leave_id = :leave_id"),
+                                  {"leave_id": leave_id}).scalar()
+
+def test_only_pending_requests_are_decided(engine):
+    # Leave 4 is pending, leave 1 was already approved
+    assert decide_leaves(engine, [4, 1], 'Deny', datetime(2024, 3, 1)) == 1
+    assert leave_status(engine, 4) == 'reject'
+    assert leave_status(engine, 1) == 'approve'
+
+def test_a_request_decided_meanwhile_is_left_alone(engine):
+    assert decide_leaves(engine, [5], 'Approve') == 1
+    # A second admin working from the same stale list changes nothing
+    assert decide_leaves(engine, [5], 'Deny') == 0
+    assert leave_status(engine, 5) == 'approve'
+
+def test_approval_queues_the_leave_months_for_repricing(engine):
+    decide_leaves(engine, [5], 'Approve')
+    with engine.connect() as connection:
+        dirty = connection.execute(text("SELECT emp_code, salary_month FROM payroll_dirty")).all()
+    assert [tuple(row) for row in dirty] == [('emp01', '2024-02')]
+
+def test_format_leave_dates():
+    assert format_leave_dates(date(2024, 1, 5)) == '2024-01-05'
+    assert format_leave_dates((date(2024, 1, 5),)) == '2024-01-05'
+    assert format_leave_dates((date(2024, 1, 5), date(2024, 1, 7))) == '2024-01-05 to 2024-01-07'
@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy import text
+
+from pagination import PAGED_TABLES, as_python, fetch_page, page_query
+
+def all_pages(engine, table, sort_column, descending=False, page_size=4, filters=None):
+    rows, after = [], None
+    while True:
+        page, has_next = fetch_page(engine, table, sort_column, descending, after, filters, page_size)
+        rows.extend(page.to_dict('records'))
+        if not has_next:
+            return rows
+        last = page.iloc[-1]
+        after = (as_python(last[sort_column]), as_python(last['attendance_id']))
+
+@pytest.mark.parametrize('sort_column', ['attendance_id', 'attendance_date', 'emp_code'])
+@pytest.mark.parametrize('descending', [False, True])
+def test_keyset_pages_cover_every_row_once_in_order(engine, sort_column, descending):
+    rows = all_pages(engine, 'attendances', sort_column, descending)
+    keys = [(row[sort_column], row['attendance_id']) for row in rows]
+    assert keys == sorted(keys, reverse=descending)
+    assert len({row['attendance_id'] for row in rows}) == len(rows) == 12
+
+def test_filters_apply_to_every_page(engine):
+    rows = all_pages(engine, 'attendances', 'attendance_date', filters={'emp_code': 'emp01', 'action_name': 'punchin'})
+    assert rows and all(row['emp_code'] == 'emp01' and row['action_name'] == 'punchin' for row in rows)
+
+def test_employee_pages_do_not_expose_passwords(engine):
+    page, _ = fetch_page(engine, 'employees', 'emp_code')
+    assert 'emp_password' not in page.columns
+    assert page['emp_code'].tolist() == ['emp01', 'emp02', 'emp03']
+
+def test_unknown_sort_columns_are_rejected(engine):
+    with pytest.raises(ValueError):
+        fetch_page(engine, 'employees', 'emp_password')
+
+@pytest.mark.parametrize('table, sort_column', [
+    (table, sort_column) for table, config in PAGED_TABLES.items() for sort_column in config['sort_columns']
+])
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('after', [None, ('2024-01-01', 1)])
+def test_every_sort_is_read_in_index_order(engine, table, sort_column, descending, after):
+    query, params = page_query(table, sort_column, descending, after)
+    with engine.connect() as connection:
+        plan = ' | '.join(row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {query}"), params))
+    # A sort that no index serves shows up as a temporary B-tree over the whole (filtered) table
+    assert 'TEMP B-TREE' not in plan, plan
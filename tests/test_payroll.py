@@ -0,0 +1,49 @@
+import pandas as pd
+
+from payroll import compute_monthly_salary, pair_punches, prepare_punches
+
+EMPLOYEES = pd.DataFrame({'emp_code': ['emp01'], 'hourly_rate': [10.0]})
+
+def punches(*rows):
+    return pd.DataFrame(rows, columns=['emp_code', 'attendance_date', 'action_name', 'action_time'])
+
+def test_pair_punches_pairs_each_punchin_with_the_next_punchout():
+    shifts = pair_punches(prepare_punches(punches(
+        ('emp01', '2024-01-02', 'punchin', '09:00:00'),
+        ('emp01', '2024-01-02', 'punchout', '12:00:00'),
+        ('emp01', '2024-01-02', 'punchin', '13:00:00'),
+        ('emp01', '2024-01-02', 'punchout', '17:30:00'),
+    )))
+    assert shifts['hours_worked'].tolist() == [3.0, 4.5]
+
+def test_pair_punches_skips_unpaired_punches():
+    shifts = pair_punches(prepare_punches(punches(
+        ('emp01', '2024-01-02', 'punchin', '08:00:00'),
+        ('emp01', '2024-01-02', 'punchin', '09:00:00'),
+        ('emp01', '2024-01-02', 'punchout', '10:00:00'),
+        ('emp01', '2024-01-02', 'punchout', '11:00:00'),
+    )))
+    assert shifts['hours_worked'].tolist() == [1.0]
+
+def test_pair_punches_does_not_pair_across_midnight():
+    shifts = pair_punches(prepare_punches(punches(
+        ('emp01', '2024-01-02', 'punchin', '22:00:00'),
+        ('emp01', '2024-01-03', 'punchout', '06:00:00'),
+    )))
+    assert shifts.empty
+
+def test_pair_punches_does_not_pair_across_employees():
+    shifts = pair_punches(prepare_punches(punches(
+        ('emp01', '2024-01-02', 'punchin', '09:00:00'),
+        ('emp02', '2024-01-02', 'punchout', '17:00:00'),
+    )))
+    assert shifts.empty
+
+def test_monthly_salary_is_hours_times_rate():
+    salary = compute_monthly_salary(punches(
+        ('emp01', '2024-01-02', 'punchin', '09:00:00'),
+        ('emp01', '2024-01-02', 'punchout', '12:30:00'),
+        ('emp01', '2024-02-01', 'punchin', '09:00:00'),
+        ('emp01', '2024-02-01', 'punchout', '10:00:00'),
+    ), EMPLOYEES)
+    assert salary[['attendance_month', 'salary']].values.tolist() == [['2024-01', 35.0], ['2024-02', 10.0]]
@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+from sqlalchemy import text
+
+import payroll
+from payroll import read_watermark, refresh_salaries, rescan_floor
+
+def add_shift(engine, emp_code, day, attendance_id=None):
+    columns = "attendance_id, " if attendance_id else ""
+    with engine.begin() as connection:
+        for action, at in (('punchin', '09:00:00'), ('punchout', '11:00:00')):
+            connection.execute(text(f"""
+                INSERT INTO attendances ({columns}emp_code, attendance_date, action_name, action_time, emp_desc)
+                VALUES ({':attendance_id, ' if attendance_id else ''}:emp_code, :day, :action, :at, '')
+            """), {"attendance_id": attendance_id, "emp_code": emp_code, "day": day, "action": action, "at": at})
+            attendance_id = attendance_id + 1 if attendance_id else None
+
+def salary(engine, emp_code, month):
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT net_salary FROM salaries WHERE emp_code = :emp_code AND salary_month = :month"),
+                                  {"emp_code": emp_code, "month": month}).scalar()
+
+def test_refresh_prices_only_new_punches_and_moves_the_watermark(engine):
+    refresh_salaries(engine)
+    assert refresh_salaries(engine) == 0
+    add_shift(engine, 'emp03', '2024-07-01')
+    assert refresh_salaries(engine) == 1
+    assert salary(engine, 'emp03', '2024-07') == 30.0
+    with engine.connect() as connection:
+        assert read_watermark(connection) == connection.execute(text("SELECT MAX(attendance_id) FROM attendances")).scalar()
+
+def test_rescan_floor_only_looks_back_on_servers():
+    assert rescan_floor(SimpleNamespace(dialect=SimpleNamespace(name='sqlite')), 9000) == 9000
+    assert rescan_floor(SimpleNamespace(dialect=SimpleNamespace(name='mysql')), 9000) == 9000 - payroll.WATERMARK_RESCAN_IDS
+    assert rescan_floor(SimpleNamespace(dialect=SimpleNamespace(name='mysql')), 10) == 0
+
+def test_rows_committed_below_the_watermark_are_picked_up_by_the_rescan(engine, monkeypatch):
+    add_shift(engine, 'emp03', '2024-07-01', attendance_id=1000)
+    refresh_salaries(engine)
+    # A row with a lower id commits after the refresh, as InnoDB allows
+    add_shift(engine, 'emp03', '2024-08-01', attendance_id=500)
+    monkeypatch.setattr(payroll, 'rescan_floor', lambda connection, last_id: max(last_id - payroll.WATERMARK_RESCAN_IDS, 0))
+    refresh_salaries(engine)
+    assert salary(engine, 'emp03', '2024-08') == 30.0
@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+from payroll import compute_monthly_salary
+from payroll_rules import DEFAULT_RULES
+
+EMPLOYEES = pd.DataFrame({'emp_code': ['emp01'], 'hourly_rate': [10.0]})
+
+def punches(*rows):
+    return pd.DataFrame(rows, columns=['emp_code', 'attendance_date', 'action_name', 'action_time'])
+
+def test_default_rules_pay_long_days_without_overtime():
+    salary = compute_monthly_salary(punches(
+        ('emp01', '2024-01-02', 'punchin', '08:00:00'),
+        ('emp01', '2024-01-02', 'punchout', '20:00:00'),
+    ), EMPLOYEES, rules=dict(DEFAULT_RULES))
+    assert salary['salary'].tolist() == [120.0]
+
+def test_overtime_rules_are_opt_in():
+    rules = dict(DEFAULT_RULES, daily_overtime_after_hours=8.0, overtime_multiplier=1.5)
+    salary = compute_monthly_salary(punches(
+        ('emp01', '2024-01-02', 'punchin', '08:00:00'),
+        ('emp01', '2024-01-02', 'punchout', '20:00:00'),
+    ), EMPLOYEES, rules=rules)
+    assert salary['salary'].tolist() == [140.0]
+
+@pytest.mark.parametrize('leave_type, expected', [('Paid', 120.0), ('Sick Leave', 40.0)])
+def test_leave_is_not_credited_on_days_worked(leave_type, expected):
+    leaves = pd.DataFrame({'emp_code': ['emp01'], 'leave_dates': ['2024-01-02 to 2024-01-03'], 'leave_type': [leave_type]})
+    leaves = leaves[leaves['leave_type'].isin(DEFAULT_RULES['paid_leave_types'])]
+    salary = compute_monthly_salary(punches(
+        ('emp01', '2024-01-02', 'punchin', '09:00:00'),
+        ('emp01', '2024-01-02', 'punchout', '13:00:00'),
+    ), EMPLOYEES, leave_data=leaves, rules=dict(DEFAULT_RULES))
+    # 4 hours worked on the 2nd, plus an 8 hour credit for the 3rd only
+    assert salary['salary'].tolist() == [expected]
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+import payroll_store
+from payroll_store import BULK_THRESHOLD, store_salaries
+
+def monthly_salaries(count, salary=100.0):
+    return pd.DataFrame({
+        'emp_code': [f"emp{index:05d}" for index in range(count)],
+        'attendance_month': ['2024-03'] * count,
+        'salary': [salary] * count,
+    })
+
+def stored(engine):
+    with engine.connect() as connection:
+        return connection.execute(text(
+            "SELECT COUNT(*), SUM(net_salary) FROM salaries WHERE salary_month = '2024-03'"
+        )).first()
+
+@pytest.mark.parametrize('count', [1, BULK_THRESHOLD, BULK_THRESHOLD + 1, 2 * BULK_THRESHOLD + 37])
+def test_save_salaries_writes_every_row(engine, count):
+    assert store_salaries(engine, monthly_salaries(count)) == count
+    assert tuple(stored(engine)) == (count, 100.0 * count)
+
+@pytest.mark.parametrize('count', [10, BULK_THRESHOLD + 1])
+def test_save_salaries_upserts_on_employee_and_month(engine, count):
+    store_salaries(engine, monthly_salaries(count))
+    store_salaries(engine, monthly_salaries(count, salary=250.0))
+    assert tuple(stored(engine)) == (count, 250.0 * count)
+
+def test_empty_results_write_nothing(engine):
+    assert store_salaries(engine, monthly_salaries(0)) == 0
+
+def test_bulk_path_issues_multi_row_statements(engine, monkeypatch):
+    statements = []
+    original = payroll_store.multi_row_upsert
+    monkeypatch.setattr(payroll_store, 'multi_row_upsert',
+                        lambda connection, row_count: statements.append(row_count) or original(connection, row_count))
+    store_salaries(engine, monthly_salaries(BULK_THRESHOLD + 1))
+    # One full-chunk statement reused for every full chunk, plus one for the remainder
+    assert statements == [payroll_store.BULK_CHUNK_ROWS, (BULK_THRESHOLD + 1) % payroll_store.BULK_CHUNK_ROWS]
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+import punch_ingest
+from punch_ingest import PunchIngestor
+
+@pytest.fixture
+def ingestor(engine):
+    ingestor = PunchIngestor(engine, rollup_interval=0)
+    yield ingestor
+    ingestor.close()
+
+def test_punches_are_committed_before_they_are_acknowledged(engine, ingestor):
+    futures = ingestor.submit_many([
+        {'emp_code': 'emp03', 'action_name': 'punchin', 'punched_at': datetime(2024, 6, 3, 9, 0)},
+        {'emp_code': 'emp03', 'action_name': 'punchout', 'punched_at': datetime(2024, 6, 3, 17, 30)},
+    ])
+    assert [future.result(5) for future in futures] == [True, True]
+    with engine.connect() as connection:
+        assert connection.execute(text(
+            "SELECT COUNT(*) FROM attendances WHERE emp_code = 'emp03' AND attendance_date = '2024-06-03'"
+        )).scalar() == 2
+
+def test_unknown_actions_are_rejected(ingestor):
+    with pytest.raises(ValueError):
+        ingestor.submit('emp03', 'lunch')
+
+def test_punch_batches_commit_with_full_sync(engine, monkeypatch):
+    levels = []
+    original = punch_ingest.run_write
+
+    def spy(engine, work, **options):
+        def recording(connection):
+            levels.append(connection.exec_driver_sql("PRAGMA synchronous").scalar())
+            return work(connection)
+        return original(engine, recording, **options)
+
+    monkeypatch.setattr(punch_ingest, 'run_write', spy)
+    ingestor = PunchIngestor(engine)
+    ingestor.record('emp03', 'punchin', punched_at=datetime(2024, 6, 4, 9, 0))
+    ingestor.close()
+    # 2 is FULL; the pooled connection goes back to NORMAL (1) afterwards
+    assert levels == [2]
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1
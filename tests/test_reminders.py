@@ -0,0 +1,27 @@
+from sqlalchemy import text
+
+from reminders import refresh_expiry_index, run_reminder_job
+from storage import run_write
+
+def indexed(engine, emp_code):
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT doc_type, expiry_date FROM document_expiry WHERE emp_code = :emp_code"),
+                                  {"emp_code": emp_code}).all()
+    return dict(rows)
+
+def test_refresh_reindexes_only_changed_employees(engine):
+    assert run_write(engine, refresh_expiry_index) == 0
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE employees SET visa_expiry_date = '2031-01-01' WHERE emp_code = 'emp02'"))
+        connection.execute(text("DELETE FROM employees WHERE emp_code = 'emp03'"))
+
+    assert run_write(engine, refresh_expiry_index) == 2
+    assert indexed(engine, 'emp02')['visa'] == '2031-01-01'
+    assert indexed(engine, 'emp03') == {}
+    assert run_write(engine, refresh_expiry_index) == 0
+
+def test_reminders_are_queued_and_sent_once(engine):
+    sent = []
+    queued, delivered = run_reminder_job(engine, sender=sent.append)
+    assert queued == delivered == len(sent) > 0
+    assert run_reminder_job(engine, sender=sent.append) == (0, 0)